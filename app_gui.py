@@ -9,11 +9,11 @@ Requirements:
 - ttkbootstrap>=1.10.1
 - spacy>=3.7.2
 - Pillow>=10.0.0
-- tabulate>=0.9.0
 - pandas>=2.0.0
 - transformers>=4.36.0
 - torch>=2.1.0
 - accelerate>=0.25.0
+- numpy>=1.24.0
 - en-core-web-md @ https://github.com/explosion/spacy-models/releases/download/en_core_web_md-3.7.1/en_core_web_md-3.7.1-py3-none-any.whl
 """
 
@@ -21,21 +21,26 @@ import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 import tkinter as tk
 from tkinter import messagebox, filedialog, simpledialog
-from db_utils import establish_connection, run_query
+from db_utils import establish_connection, run_query_shared, run_queries_parallel, QueryHandle
 from nlp_utils import detect_intent
-from supported_questions import INTENTS
+from supported_questions import dashboard_intents, paged_query
 from phi2_utils import MistralHandler
+from cache_utils import AnswerCache, answer_context_hash
+from stream_utils import FraudStreamScorer
+from email_utils import send_dataframe_email
+from model_worker import WORKER_FLAG, RemoteMistralHandler, parse_address
+from catalog_utils import IntentCatalog
+from approx_utils import can_approximate, run_approximate
+from format_utils import TableFormatter, format_table
 import spacy
-from tabulate import tabulate
 import pandas as pd
 from typing import Optional
 import threading
 import time
 from PIL import Image, ImageTk
-import smtplib
-from email.message import EmailMessage
-import tempfile
 import os
+import sys
+import uuid
 
 # Professional color palette
 BG_COLOR = "#ffffff"  # Clean white background
@@ -47,6 +52,26 @@ BORDER_COLOR = "#dee2e6"  # Border color
 HOVER_COLOR = "#e9ecef"  # Hover state color
 FONT_MAIN = ("Segoe UI", 14, "bold")  # Smaller main font
 
+# Optional .npz file for persisting AI answers between sessions
+ANSWER_CACHE_PATH = os.environ.get("FRAUDGUARD_ANSWER_CACHE")
+
+# Query governance: statement timeout (seconds), row budget, and page size for unbounded intents
+QUERY_TIMEOUT = 120
+MAX_RESULT_ROWS = 50000
+PAGE_SIZE = 1000
+
+# Maximum number of dashboard queries running against the server at once
+DASHBOARD_MAX_WORKERS = 4
+
+# Seconds between polls for new transactions once live scoring has caught up
+LIVE_POLL_INTERVAL = 5.0
+
+# "host:port" of a shared model worker; when unset the model is loaded in-process
+MODEL_WORKER_ADDRESS = os.environ.get("FRAUDGUARD_MODEL_WORKER")
+
+# JSON intent catalog, reloaded while the app runs; the built-in intents are used until it exists
+INTENTS_FILE = os.environ.get("FRAUDGUARD_INTENTS_FILE", "intents.json")
+
 class NLPBotApp:
     def __init__(self, master):
         self.master = master
@@ -74,19 +99,36 @@ class NLPBotApp:
         master.bind("<Configure>", self._resize_bg)
 
         self.nlp = spacy.load("en_core_web_md")
-        self.intent_docs = {
-            intent: [self.nlp(text) for text in data["examples"]]
-            for intent, data in INTENTS.items()
-        }
+        self.intent_catalog = IntentCatalog(self.nlp, INTENTS_FILE)
+        self.intent_catalog.start_watching()
 
-        # Initialize Mistral handler
-        self.mistral_handler = MistralHandler()
+        # Initialize Mistral handler, in a shared worker process if one is configured
+        if MODEL_WORKER_ADDRESS:
+            self.mistral_handler = RemoteMistralHandler(parse_address(MODEL_WORKER_ADDRESS))
+            self.mistral_handler.start_health_monitor()
+        else:
+            self.mistral_handler = MistralHandler()
         self.ai_available = self.mistral_handler.is_available()
+        self.answer_cache = AnswerCache(path=ANSWER_CACHE_PATH)
+        # Conversation session, so follow-up questions see the earlier turns
+        self.session_id = uuid.uuid4().hex
+        self.conversation = []
 
         self.server = None
         self.database = None
         self.last_result_df: Optional[pd.DataFrame] = None
         self.loading_frame = None
+        # Running query (cancellable) and paging state of the last unbounded intent
+        self.active_query: Optional[QueryHandle] = None
+        self.current_page = None
+        # Results of the dashboard warm-up, keyed by intent
+        self.dashboard_results = {}
+        self.prefetched_results = {}
+        self.dashboard_lock = threading.Lock()
+        # Live fraud scoring state
+        self.live_stop_event = None
+        self.alerts_window = None
+        self.alerts_list = None
 
         self.create_server_db_widgets()
 
@@ -158,6 +200,7 @@ class NLPBotApp:
             conn.close()
             messagebox.showinfo("Connection Status", "✅ Connection established successfully!")
             self.create_widgets()
+            self.start_dashboard_warmup()
         except Exception as e:
             messagebox.showerror("Connection Status", f"❌ Failed to connect: {e}")
 
@@ -334,6 +377,32 @@ class NLPBotApp:
         )
         self.send_email_button.pack(side="left", padx=5)
 
+        self.dashboard_button = tb.Button(button_frame, text="Dashboard", command=self.show_dashboard,
+                                        width=12, style="secondary.TButton")
+        self.dashboard_button.pack(side="left", padx=5)
+
+        self.live_button = tb.Button(button_frame, text="Live Alerts", command=self.toggle_live_scoring,
+                                   width=12, style="secondary.TButton")
+        self.live_button.pack(side="left", padx=5)
+
+        self.cancel_button = tb.Button(button_frame, text="Cancel", command=self.cancel_query,
+                                     width=10, style="secondary.TButton")
+        self.cancel_button.pack(side="left", padx=5)
+
+        self.next_page_button = tb.Button(button_frame, text="Next Page", command=self.next_page,
+                                        width=10, style="secondary.TButton")
+        self.next_page_button.pack(side="left", padx=5)
+
+        self.new_chat_button = tb.Button(button_frame, text="New Chat", command=self.new_chat,
+                                       width=10, style="secondary.TButton")
+        self.new_chat_button.pack(side="left", padx=5)
+
+        # Approximate mode: answer aggregate intents from a sample first, then refine
+        self.approx_mode = tk.BooleanVar(value=False)
+        self.approx_check = tb.Checkbutton(main_panel, text="Fast approximate answers (refined in the background)",
+                                           variable=self.approx_mode)
+        self.approx_check.pack(anchor="w", padx=10, pady=(0, 10))
+
         # Result text area with improved styling
         result_frame = tk.Frame(main_panel, bg=BORDER_COLOR, bd=1, relief="solid")
         result_frame.pack(fill="both", expand=True, padx=10)
@@ -346,6 +415,14 @@ class NLPBotApp:
         # Add "Powered by" text at the bottom right
         powered_frame = tk.Frame(main_panel)
         powered_frame.pack(fill="x", pady=(5, 0))
+
+        self.live_status_label = tk.Label(
+            powered_frame,
+            text="",
+            font=("Segoe UI", 9),
+            fg=SECONDARY_COLOR
+        )
+        self.live_status_label.pack(side="left", padx=10)
         
         powered_label = tk.Label(
             powered_frame,
@@ -379,15 +456,32 @@ class NLPBotApp:
             self.master.quit()
             return
 
+        # A new question supersedes any query that is still running
+        self.cancel_query()
+
         # First try to match with SQL intents
-        intent = detect_intent(user_question=user_question, intent_docs=self.intent_docs, nlp=self.nlp)
+        catalog = self.intent_catalog.snapshot
+        intent = detect_intent(user_question=user_question, intent_docs=catalog.intent_docs, nlp=self.nlp)
 
         if intent:
             # Handle SQL query
-            query = INTENTS[intent]["query"]
+            data = catalog.intents[intent]
             if self.server is not None and self.database is not None:
-                result_df = run_query(str(self.server), str(self.database), query)
-                self.display_results(result_df)
+                # Serve the warm-up result once, then query fresh on later asks
+                with self.dashboard_lock:
+                    result_df = self.prefetched_results.pop(intent, None)
+                if result_df is not None:
+                    self.current_page = None
+                    self.display_results(result_df)
+                elif data.get("unbounded"):
+                    # Never pull a whole table: fetch it one page at a time
+                    self.current_page = {"query": data["query"], "order_by": data.get("order_by"), "offset": 0}
+                    self._run_query_async(paged_query(data["query"], 0, PAGE_SIZE, data.get("order_by")))
+                else:
+                    self.current_page = None
+                    # Only estimate the built-in query; an edited intent may ask something else
+                    approx_intent = intent if self.approx_mode.get() and can_approximate(intent, data["query"]) else None
+                    self._run_query_async(data["query"], approx_intent=approx_intent)
             else:
                 messagebox.showerror("Connection Error", "Server or database information is missing.")
         else:
@@ -399,6 +493,179 @@ class NLPBotApp:
                     "Sorry, I couldn't understand that question and the AI model is not available. "
                     "Please try rephrasing your question or check if the AI model is properly installed.")
 
+    def _run_query_async(self, query: str, approx_intent: str = None):
+        """
+        Run a query in the background under the timeout and row budget, then display it.
+        If approx_intent is given, an estimate from a table sample is computed alongside
+        the exact query and shown until the exact result arrives.
+        """
+        handle = QueryHandle()
+        self.active_query = handle
+        self.update_result_text("Running query... (press Cancel to stop it)")
+        server, database = str(self.server), str(self.database)
+
+        def worker():
+            try:
+                result_df = None if handle.cancelled else run_query_shared(
+                    server, database, query, timeout=QUERY_TIMEOUT, max_rows=MAX_RESULT_ROWS, handle=handle)
+            except Exception as e:
+                print(f"Error running query:\n{e}")
+                result_df = None
+            self.master.after(0, lambda: finish(result_df))
+
+        def approx_worker():
+            try:
+                approx_df = run_approximate(server, database, approx_intent, timeout=QUERY_TIMEOUT, handle=handle,
+                                            exact_query=query)
+            except Exception as e:
+                print(f"Error computing approximate answer:\n{e}")
+                return
+            if approx_df is not None and not handle.cancelled:
+                self.master.after(0, lambda: show_estimate(approx_df))
+
+        def show_estimate(approx_df):
+            # The exact result may already be on screen; never replace it with the estimate
+            if self.active_query is handle:
+                self.display_results(approx_df)
+
+        def finish(result_df):
+            if self.active_query is not handle:
+                return  # Superseded by a newer question
+            self.active_query = None
+            if handle.cancelled:
+                self.update_result_text("Query cancelled.")
+            elif result_df is None:
+                self.show_error("The query failed or timed out. Please try again or narrow the question.")
+            else:
+                self.display_results(result_df)
+                if approx_intent:
+                    handle.cancel()  # The exact answer is in, so stop a sample query still running
+
+        threading.Thread(target=worker, daemon=True).start()
+        if approx_intent:
+            threading.Thread(target=approx_worker, daemon=True).start()
+
+    def cancel_query(self):
+        """Cancel the running query on the server."""
+        handle = self.active_query
+        if handle is not None:
+            self.active_query = None
+            handle.cancel()
+            self.update_result_text("Query cancelled.")
+
+    def next_page(self):
+        """Fetch the next page of the last unbounded intent."""
+        page = self.current_page
+        if page is None or self.last_result_df is None or len(self.last_result_df) < PAGE_SIZE:
+            messagebox.showinfo("Next Page", "There are no more rows to show.")
+            return
+        self.cancel_query()
+        page["offset"] += PAGE_SIZE
+        self._run_query_async(paged_query(page["query"], page["offset"], PAGE_SIZE, page["order_by"]))
+
+    def start_dashboard_warmup(self):
+        """Run all dashboard intents concurrently in the background and prefill their results."""
+        if self.server is None or self.database is None:
+            return
+        server, database = str(self.server), str(self.database)
+        with self.dashboard_lock:
+            self.dashboard_results.clear()
+            self.prefetched_results.clear()
+
+        def warmup():
+            try:
+                results = run_queries_parallel(server, database,
+                                               dashboard_intents(self.intent_catalog.snapshot.intents),
+                                               max_workers=DASHBOARD_MAX_WORKERS,
+                                               timeout=QUERY_TIMEOUT, max_rows=MAX_RESULT_ROWS)
+            except Exception as e:
+                print(f"Error warming up dashboard: {e}")
+                return
+            with self.dashboard_lock:
+                for intent, result_df in results.items():
+                    if result_df is not None:
+                        self.dashboard_results[intent] = result_df
+                        self.prefetched_results[intent] = result_df
+
+        threading.Thread(target=warmup, daemon=True).start()
+
+    def show_dashboard(self):
+        """Show every prefilled dashboard result in the result text widget."""
+        with self.dashboard_lock:
+            results = dict(self.dashboard_results)
+        if not results:
+            self.update_result_text("Dashboard is still loading. Please try again in a moment.")
+            return
+        sections = []
+        for intent, result_df in results.items():
+            title = intent.replace('_', ' ').title()
+            table_str = format_table(result_df)
+            sections.append(f"{title}\n{table_str}")
+        self.update_result_text("\n\n".join(sections))
+
+    def toggle_live_scoring(self):
+        """Start or stop real-time scoring of new transactions."""
+        if self.live_stop_event is not None:
+            self.live_stop_event.set()
+            self.live_stop_event = None
+            self.live_button.configure(text="Live Alerts")
+            self.live_status_label.configure(text="Live scoring stopped")
+            return
+        if self.server is None or self.database is None:
+            messagebox.showerror("Connection Error", "Server or database information is missing.")
+            return
+
+        self._open_alerts_window()
+        self.live_stop_event = threading.Event()
+        self.live_button.configure(text="Stop Live")
+        self.live_status_label.configure(text="Live scoring starting...")
+        scorer = FraudStreamScorer(str(self.server), str(self.database))
+
+        def on_alerts(alerts):
+            self.master.after(0, lambda: self._show_alerts(alerts))
+
+        def on_stats(stats):
+            self.master.after(0, lambda: self._show_live_stats(stats))
+
+        threading.Thread(
+            target=scorer.run,
+            args=(self.live_stop_event, on_alerts, on_stats, LIVE_POLL_INTERVAL),
+            daemon=True
+        ).start()
+
+    def _open_alerts_window(self):
+        if self.alerts_window is not None and self.alerts_window.winfo_exists():
+            self.alerts_window.lift()
+            return
+        self.alerts_window = tk.Toplevel(self.master)
+        self.alerts_window.title("Live Fraud Alerts")
+        self.alerts_window.geometry("700x300")
+        self.alerts_list = tk.Listbox(self.alerts_window, font=("Consolas", 10),
+                                      fg=TEXT_COLOR, bg=BG_COLOR, bd=0)
+        self.alerts_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def _show_alerts(self, alerts):
+        """Append alerts to the alerts window, newest first."""
+        if self.alerts_window is None or not self.alerts_window.winfo_exists():
+            self._open_alerts_window()
+        for _, row in alerts.iterrows():
+            self.alerts_list.insert(
+                0,
+                f"{row['Trans_Date_Trans_Time']}  card {row['Cc_Num']}  {row['Category']}  "
+                f"{row['Amount']:.2f}  score {row['Fraud_Score']:.1f}  ({row['Reasons']})"
+            )
+        self.alerts_list.delete(500, tk.END)  # Keep the list short
+
+    def _show_live_stats(self, stats):
+        lag, age = stats["processing_lag_seconds"], stats["data_age_seconds"]
+        lag_text = "n/a" if lag is None else f"{lag:.0f}s"
+        age_text = "n/a" if age is None else f"{age:.0f}s"
+        backlog = ", catching up" if stats["backlog"] else ""
+        self.live_status_label.configure(
+            text=f"Live: {stats['rows_scored']} rows scored, {stats['alerts']} alerts, "
+                 f"{stats['rows_per_second']:.0f} rows/s, lag {lag_text}{backlog}, newest data {age_text} old"
+        )
+
     def _handle_ai_question(self, question: str):
         """Handle questions using the AI model."""
         self.result_text.delete(1.0, tk.END)
@@ -432,11 +699,26 @@ class NLPBotApp:
                 # Start spinner animation
                 update_spinner()
                 # Use spaCy-based intent detection for context decision
-                detected_intent = detect_intent(user_question=question, intent_docs=self.intent_docs, nlp=self.nlp)
+                catalog = self.intent_catalog.snapshot
+                detected_intent = detect_intent(user_question=question, intent_docs=catalog.intent_docs, nlp=self.nlp)
                 use_context = detected_intent is not None
                 # Pass last_result_summary as extra context if available
                 extra_context = getattr(self, 'last_result_summary', '')
-                response = self.mistral_handler.generate_response(question, use_context=use_context, extra_context=extra_context)
+                # Serve repeated and paraphrased questions from the answer cache; earlier turns
+                # are part of the key, so follow-ups only match the same conversation so far
+                session_id, conversation = self.session_id, self.conversation
+                question_vector = self.nlp(question).vector
+                ctx_hash = answer_context_hash(use_context, extra_context, catalog.version, conversation)
+                response = self.answer_cache.get(question, question_vector, ctx_hash)
+                if response is not None:
+                    self.mistral_handler.record_turn(session_id, question, response)
+                    conversation.append(question)
+                else:
+                    response = self.mistral_handler.generate_response(question, use_context=use_context, extra_context=extra_context,
+                                                                      intents=catalog.intents, session_id=session_id)
+                    if not response.startswith(("Error generating response", "AI model is not initialized")):
+                        self.answer_cache.put(question, question_vector, ctx_hash, response)
+                        conversation.append(question)
                 # Clear loading animation and show response
                 if self.loading_frame is not None and self.loading_frame.winfo_exists():
                     self.loading_frame.destroy()
@@ -456,15 +738,32 @@ class NLPBotApp:
         # Start AI processing in a separate thread
         threading.Thread(target=process_ai_response, daemon=True).start()
 
+    def new_chat(self):
+        """Start a new conversation so the next question does not follow up on earlier ones."""
+        # Freeing the old session may wait on the model or the worker, so keep it off the UI thread
+        threading.Thread(target=self.mistral_handler.end_session, args=(self.session_id,), daemon=True).start()
+        self.session_id = uuid.uuid4().hex
+        self.conversation = []
+        self.update_result_text("Started a new conversation.")
+
     def display_results(self, result_df):
         self.result_text.delete(1.0, tk.END)
         self.last_result_df = result_df  # Store for export
         # Store a summary string for LLM context (first 5 rows)
         if result_df is not None and not result_df.empty:
-            table_str = tabulate(result_df, headers='keys', tablefmt='psql', showindex=False)
-            self.result_text.insert(tk.END, table_str)
-            # Save a short summary for LLM context (first 5 rows)
-            self.last_result_summary = tabulate(result_df.head(5), headers='keys', tablefmt='psql', showindex=False)
+            formatter = TableFormatter(result_df)
+            self.result_text.insert(tk.END, formatter.format())
+            if self.current_page is not None:
+                first = self.current_page["offset"] + 1
+                self.result_text.insert(tk.END, f"\n\nRows {first}-{first + len(result_df) - 1}. Press Next Page for more.")
+            elif result_df.attrs.get("approximate"):
+                fraction = result_df.attrs.get("sample_fraction", 0.0)
+                self.result_text.insert(tk.END, f"\n\nApproximate answer from a {fraction:.2%} sample, with 95% "
+                                                "confidence intervals. Refining to the exact answer...")
+            elif result_df.attrs.get("truncated"):
+                self.result_text.insert(tk.END, f"\n\nShowing the first {len(result_df)} rows (row budget reached).")
+            # Save a short summary for LLM context (first 5 rows), padded only as wide as those rows
+            self.last_result_summary = format_table(result_df.head(5))
         else:
             self.result_text.insert(tk.END, "No results found.")
             self.last_result_summary = None
@@ -473,9 +772,14 @@ class NLPBotApp:
         if self.last_result_df is None or self.last_result_df.empty:
             messagebox.showwarning("Export", "No results to export.")
             return
-        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                                 filetypes=[("Excel files", "*.xlsx"), ("Text files", "*.txt")])
         if file_path:
-            self.last_result_df.to_excel(file_path, index=False)
+            if file_path.lower().endswith(".txt"):
+                with open(file_path, "w", encoding="utf-8") as f:
+                    f.write(format_table(self.last_result_df))
+            else:
+                self.last_result_df.to_excel(file_path, index=False)
             messagebox.showinfo("Export", f"Results exported to {file_path}")
 
     def send_results_email(self):
@@ -531,37 +835,13 @@ class NLPBotApp:
                 messagebox.showerror("Error", "Please fill in all fields.", parent=dialog)
                 return
 
-            # Save DataFrame to a temporary Excel file
-            with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp:
-                assert self.last_result_df is not None
-                self.last_result_df.to_excel(tmp.name, index=False)
-                tmp_path = tmp.name
-
-            SMTP_SERVER = "smtp.gmail.com"
-            SMTP_PORT = 587
-
-            msg = EmailMessage()
-            msg["Subject"] = "FraudGuard Analysis Results"
-            msg["From"] = sender
-            msg["To"] = recipient
-            msg.set_content("Please find the fraud analysis results attached.")
-
-            with open(tmp_path, "rb") as f:
-                file_data = f.read()
-                file_name = "results.xlsx"
-                msg.add_attachment(file_data, maintype="application", subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename=file_name)
-
             try:
-                with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                    server.starttls()
-                    server.login(sender, password)
-                    server.send_message(msg)
+                assert self.last_result_df is not None
+                send_dataframe_email(self.last_result_df, sender, password, recipient)
                 messagebox.showinfo("Success", f"Results sent to {recipient}", parent=dialog)
                 dialog.destroy()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to send email:\n{e}", parent=dialog)
-            finally:
-                os.remove(tmp_path)
 
         # Send button
         send_btn = tb.Button(button_frame, text="Send", command=on_send, 
@@ -577,6 +857,11 @@ class NLPBotApp:
         dialog.wait_window()
 
 if __name__ == "__main__":
+    if WORKER_FLAG in sys.argv:
+        # The packaged app doubles as the shared model worker, see model_worker.py
+        from model_worker import main as run_model_worker
+        run_model_worker(sys.argv[sys.argv.index(WORKER_FLAG) + 1:])
+        sys.exit(0)
     root = tb.Window(themename="flatly")
     style = tb.Style()
     style.configure("primary.TButton", font=("Segoe UI", 11))
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('C:\\Users\\Zol0\\AppData\\Local\\Programs\\Python\\Python312\\Lib\\site-packages\\en_core_web_md', 'en_core_web_md')],
-    hiddenimports=[],
+    hiddenimports=['model_worker', 'phi2_utils'],  # The exe also runs as the model worker (--model-worker)
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
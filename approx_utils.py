@@ -0,0 +1,231 @@
+"""
+Approximate Answers Module
+
+This module answers the aggregate intents from a TABLESAMPLE of CustomerTransactions,
+scaling the sampled counts and amounts up to the whole table and reporting 95%
+confidence intervals for the fraud ratios. The sample consists of whole pages, so
+the intervals are computed from the variation between sampled pages. It gives a fast
+first answer on tables too large to scan interactively, while the exact query runs
+in the background.
+"""
+
+import numpy as np
+import pandas as pd
+from db_utils import run_query
+from report_utils import combine_category_volume, combine_fraud_per_month
+from supported_questions import CATEGORY_VOLUME_SQL, FRAUD_PerMonth_SQL, same_query
+
+Z_95 = 1.96
+
+# Row count from catalog metadata, so sizing the sample does not scan the table
+TABLE_ROWS_SQL = """
+SELECT SUM(rows) AS Table_Rows
+FROM sys.partitions
+WHERE object_id = OBJECT_ID('dbo.CustomerTransactions') AND index_id IN (0, 1)
+"""
+
+# Month range from the column statistics histogram, so finding months the sample
+# missed does not scan the table either
+MONTH_RANGE_SQL = """
+SELECT
+    MIN(CAST(h.range_high_key AS DATETIME2)) AS First_Time,
+    MAX(CAST(h.range_high_key AS DATETIME2)) AS Last_Time
+FROM sys.stats AS s
+JOIN sys.stats_columns AS sc
+    ON sc.object_id = s.object_id AND sc.stats_id = s.stats_id AND sc.stats_column_id = 1
+JOIN sys.columns AS c ON c.object_id = sc.object_id AND c.column_id = sc.column_id
+CROSS APPLY sys.dm_db_stats_histogram(s.object_id, s.stats_id) AS h
+WHERE s.object_id = OBJECT_ID('dbo.CustomerTransactions') AND c.name = 'Trans_Date_Trans_Time'
+"""
+
+# TABLESAMPLE SYSTEM samples whole pages, so the sample is grouped by page
+# (the file and page part of %%physloc%%) to estimate variance between pages
+FRAUD_PerMonth_SAMPLE_SQL = """
+SELECT
+    SUBSTRING(%%physloc%%, 1, 6) AS Page,
+    FORMAT(Trans_Date_Trans_Time, 'yyyy-MM') AS Month,
+    SUM(CASE WHEN Is_fraud = 1 THEN 1 ELSE 0 END) AS Fraudulent_Transactions,
+    SUM(CASE WHEN Is_fraud = 0 THEN 1 ELSE 0 END) AS Total_Transactions
+FROM [dbo].[CustomerTransactions] TABLESAMPLE SYSTEM ({percent} PERCENT)
+GROUP BY SUBSTRING(%%physloc%%, 1, 6), FORMAT(Trans_Date_Trans_Time, 'yyyy-MM')
+"""
+
+CATEGORY_VOLUME_SAMPLE_SQL = """
+SELECT
+    SUBSTRING(%%physloc%%, 1, 6) AS Page,
+    Category,
+    COUNT(*) AS Sampled_Rows,
+    SUM(CAST(Amount AS FLOAT)) AS Total_Amount,
+    SUM(CASE WHEN Is_Fraud = 1 THEN CAST(Amount AS FLOAT) ELSE 0 END) AS Fraudulent_Amount
+FROM [dbo].[CustomerTransactions] TABLESAMPLE SYSTEM ({percent} PERCENT)
+GROUP BY SUBSTRING(%%physloc%%, 1, 6), Category
+"""
+
+NOT_SAMPLED = "not sampled"
+
+
+def _format_interval(low, high) -> str:
+    return f"{max(low, 0.0):,.2f}% - {min(high, 100.0):,.2f}%"
+
+
+def _ratio_intervals(sample: pd.DataFrame, group: str, numerator: str, denominator: str,
+                     fraction: float) -> pd.Series:
+    """
+    95% confidence interval of sum(numerator) / sum(denominator) for each group.
+
+    Each sample row holds one page's sums for one group. Pages are the sampling units,
+    each kept with probability fraction, so the linearized ratio variance is
+    (1 - fraction) * sum over pages of (a - R*b)^2 / (sum of b)^2.
+    """
+    sums = sample.groupby(group)[[numerator, denominator]].sum()
+    # Few sampled pages make the variance itself uncertain, so widen with a Student t
+    # critical value (Cornish-Fisher expansion in the degrees of freedom)
+    dof = (sample.groupby(group).size() - 1).clip(lower=1).astype(float)
+    critical = Z_95 + (Z_95 ** 3 + Z_95) / (4 * dof) + (5 * Z_95 ** 5 + 16 * Z_95 ** 3 + 3 * Z_95) / (96 * dof ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = sums[numerator] / sums[denominator]
+        residual = sample[numerator] - sample[group].map(ratio) * sample[denominator]
+        spread = (residual ** 2).groupby(sample[group]).sum()
+        margin = critical * np.sqrt(max(0.0, 1.0 - fraction) * spread) / sums[denominator] * 100
+    return pd.Series({
+        # With no fraud in the sample the spread is zero, which says nothing about the interval
+        key: "n/a" if sums.at[key, numerator] == 0 or not np.isfinite(r) or not np.isfinite(m)
+        else _format_interval(r * 100 - m, r * 100 + m)
+        for key, r, m in zip(sums.index, ratio, margin)
+    }, dtype=object)
+
+
+def _estimate_fraud_per_month(sample: pd.DataFrame, table_rows: float, months: list = None) -> pd.DataFrame:
+    """Scale sampled monthly counts up and add a confidence interval for each fraud ratio."""
+    columns = ["Fraudulent_Transactions", "Total_Transactions"]
+    sampled_rows = sample[columns].to_numpy().sum()
+    fraction = sampled_rows / table_rows
+
+    monthly = sample.groupby("Month", as_index=False)[columns].sum()
+    for column in columns:
+        monthly[column] = (monthly[column] / fraction).round().astype(np.int64)
+    result = combine_fraud_per_month(monthly)
+
+    pages = sample.groupby("Page", as_index=False)[columns].sum().assign(Month="Grand Total")
+    intervals = pd.concat([
+        _ratio_intervals(sample, "Month", *columns, fraction),
+        _ratio_intervals(pages, "Month", *columns, fraction),
+    ])
+    result["Fraudulent_Ratio_95CI"] = result["Month"].map(intervals)
+
+    # Months with no sampled page are listed explicitly rather than silently dropped
+    missing = sorted(set(months or []) - set(monthly["Month"]))
+    if missing:
+        gaps = pd.DataFrame({"Month": missing, "Fraudulent_Ratio": NOT_SAMPLED,
+                             "Fraudulent_Ratio_95CI": NOT_SAMPLED})
+        months_only = pd.concat([result.iloc[:-1], gaps], ignore_index=True).sort_values("Month")
+        result = pd.concat([months_only, result.iloc[-1:]], ignore_index=True)
+        for column in columns:
+            result[column] = result[column].astype("Int64")
+    return result
+
+
+def _estimate_category_volume(sample: pd.DataFrame, table_rows: float) -> pd.DataFrame:
+    """Scale sampled category amounts up and add a confidence interval for each fraud ratio."""
+    fraction = sample["Sampled_Rows"].sum() / table_rows
+
+    scaled = sample.groupby("Category", as_index=False)[["Total_Amount", "Fraudulent_Amount"]].sum()
+    scaled["Total_Amount"] = scaled["Total_Amount"] / fraction
+    scaled["Fraudulent_Amount"] = scaled["Fraudulent_Amount"] / fraction
+    result = combine_category_volume(scaled)
+
+    intervals = _ratio_intervals(sample, "Category", "Fraudulent_Amount", "Total_Amount", fraction)
+    result["Fraud_Ratio_95CI"] = result["Category"].map(intervals)
+    return result
+
+
+def _month_range(server: str, database: str, sample: pd.DataFrame, timeout: int = None, handle=None) -> list:
+    """Every month from the first to the last transaction, per the statistics and the sample."""
+    bounds = [pd.Period(sample["Month"].min(), freq="M"), pd.Period(sample["Month"].max(), freq="M")]
+    range_df = run_query(server, database, MONTH_RANGE_SQL, timeout=timeout, handle=handle)
+    if range_df is not None and not range_df.empty:
+        # The histogram may predate the newest rows, so it can only widen the range
+        for column in ("First_Time", "Last_Time"):
+            value = range_df[column].iloc[0]
+            if not pd.isna(value):
+                bounds.append(pd.Timestamp(value).to_period("M"))
+    return list(pd.period_range(min(bounds), max(bounds), freq="M").strftime("%Y-%m"))
+
+
+# Intents that can be answered approximately from a sample, and the built-in query
+# each sample query estimates
+APPROX_INTENTS = {
+    "fraud_analysis": {"query": FRAUD_PerMonth_SAMPLE_SQL, "estimate": _estimate_fraud_per_month,
+                       "monthly": True, "exact": FRAUD_PerMonth_SQL},
+    "category_volume": {"query": CATEGORY_VOLUME_SAMPLE_SQL, "estimate": _estimate_category_volume,
+                        "exact": CATEGORY_VOLUME_SQL},
+}
+
+
+def can_approximate(intent: str, query: str) -> bool:
+    """
+    Check whether an intent can be estimated from a sample.
+
+    Only the built-in queries can: an intent edited in the catalog file may ask a
+    different question than the sample query answers.
+
+    Args:
+        intent (str): The intent name.
+        query (str): The intent's query in the loaded catalog.
+
+    Returns:
+        bool: True if run_approximate estimates this exact query.
+    """
+    spec = APPROX_INTENTS.get(intent)
+    return spec is not None and same_query(query, spec["exact"])
+
+
+def run_approximate(server: str, database: str, intent: str, target_rows: int = 100000,
+                    min_table_rows: int = 500000, timeout: int = None, handle=None,
+                    exact_query: str = None):
+    """
+    Answer an intent approximately from a sample of about target_rows rows.
+
+    Args:
+        server (str): SQL Server name.
+        database (str): Database name.
+        intent (str): The intent to answer; must be in APPROX_INTENTS.
+        target_rows (int): Approximate number of rows to sample.
+        min_table_rows (int): Tables smaller than this are not sampled, since the exact
+            answer is fast enough.
+        timeout (int): Statement timeout in seconds.
+        handle (QueryHandle): Optional handle for cancelling the sample query.
+        exact_query (str): The catalog query being estimated; nothing is estimated if it
+            is not the built-in query for the intent, see can_approximate().
+
+    Returns:
+        DataFrame or None: The estimated result, with df.attrs["approximate"] and
+        df.attrs["sample_fraction"] set, or None if no useful sample could be taken.
+    """
+    spec = APPROX_INTENTS.get(intent)
+    if spec is None or (exact_query is not None and not can_approximate(intent, exact_query)):
+        return None
+
+    rows_df = run_query(server, database, TABLE_ROWS_SQL, timeout=timeout, handle=handle)
+    if rows_df is None or rows_df.empty or pd.isna(rows_df["Table_Rows"].iloc[0]):
+        return None
+    table_rows = float(rows_df["Table_Rows"].iloc[0])
+    if table_rows < min_table_rows:
+        return None
+
+    percent = min(100.0, max(0.01, target_rows / table_rows * 100))
+    sample = run_query(server, database, spec["query"].format(percent=f"{percent:.4f}"),
+                       timeout=timeout, handle=handle)
+    if sample is None or sample.empty:
+        return None
+
+    if spec.get("monthly"):
+        months = _month_range(server, database, sample, timeout=timeout, handle=handle)
+        result = spec["estimate"](sample, table_rows, months=months)
+    else:
+        result = spec["estimate"](sample, table_rows)
+    sampled_rows = sample["Sampled_Rows"].sum() if "Sampled_Rows" in sample else (
+        sample["Fraudulent_Transactions"].sum() + sample["Total_Transactions"].sum())
+    result.attrs["approximate"] = True
+    result.attrs["sample_fraction"] = sampled_rows / table_rows
+    return result
@@ -0,0 +1,204 @@
+"""
+Batch Question Module
+
+This module answers a file of questions in one run. All questions are classified
+together with nlp.pipe and a single similarity matrix, questions are grouped by
+intent so every distinct SQL query runs once, and the remaining questions go to
+the AI model in batches.
+
+Usage:
+    python batch_utils.py questions.txt --server MY-SERVER --database FraudDB --output results.xlsx
+"""
+
+import argparse
+import os
+import time
+import pandas as pd
+from cache_utils import AnswerCache, answer_context_hash
+from catalog_utils import IntentCatalog
+from db_utils import run_queries_parallel
+from nlp_utils import detect_intents, load_spacy_model
+from supported_questions import paged_query
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_ROWS = 50000
+DEFAULT_PAGE_SIZE = 1000
+
+
+def read_questions(path: str) -> list:
+    """
+    Read questions from a text file (one per line) or a CSV file with a "question" column.
+
+    Args:
+        path (str): Path of the questions file.
+
+    Returns:
+        list: The questions, without blank lines and "#" comments.
+    """
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path)
+        column = "question" if "question" in df.columns else df.columns[0]
+        questions = df[column].dropna().astype(str).tolist()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            questions = f.read().splitlines()
+    return [q.strip() for q in questions if q.strip() and not q.strip().startswith("#")]
+
+
+def run_batch(questions: list, server: str, database: str, nlp, catalog, handler_factory=None,
+              answer_cache: AnswerCache = None, timeout: int = DEFAULT_TIMEOUT,
+              max_rows: int = DEFAULT_MAX_ROWS, ai_batch_size: int = 8):
+    """
+    Answer a list of questions.
+
+    Args:
+        questions (list): The questions to answer.
+        server (str): SQL Server name.
+        database (str): Database name.
+        nlp: Loaded spaCy model.
+        catalog (IntentSnapshot): Intents and example docs to match against.
+        handler_factory (callable): Returns the AI handler; only called if some question needs it.
+        answer_cache (AnswerCache): Optional cache of AI answers.
+        timeout (int): Statement timeout in seconds for each query.
+        max_rows (int): Row budget for each query.
+        ai_batch_size (int): Number of questions generated together.
+
+    Returns:
+        tuple: (summary DataFrame with one row per question, dict of intent -> result DataFrame)
+    """
+    started = time.perf_counter()
+    docs = list(nlp.pipe(questions))
+    matches = detect_intents(docs, catalog.intent_docs)
+    classify_ms = (time.perf_counter() - started) * 1000 / max(1, len(questions))
+
+    rows = [
+        {"Question": q, "Intent": intent, "Score": round(score, 3), "Answer_Type": "sql" if intent else "ai",
+         "Answer": None, "Rows": None, "Classify_ms": round(classify_ms, 1), "Answer_ms": None}
+        for q, (intent, score) in zip(questions, matches)
+    ]
+
+    # Run each distinct intent query once for every question that matched it
+    groups = {}
+    for index, row in enumerate(rows):
+        if row["Intent"]:
+            groups.setdefault(row["Intent"], []).append(index)
+    queries = {}
+    for intent in groups:
+        data = catalog.intents[intent]
+        queries[intent] = (paged_query(data["query"], 0, DEFAULT_PAGE_SIZE, data.get("order_by"))
+                           if data.get("unbounded") else data["query"])
+
+    results = {}
+    if queries:
+        timings = {}
+        results = run_queries_parallel(server, database, queries, timings=timings, timeout=timeout, max_rows=max_rows)
+        for intent, members in groups.items():
+            result_df = results.get(intent)
+            # Every question of a group was answered by the same run of its query
+            query_ms = timings.get(intent, 0.0) * 1000
+            for index in members:
+                rows[index]["Answer_ms"] = round(query_ms, 1)
+                if result_df is None:
+                    rows[index]["Answer_Type"] = "error"
+                    rows[index]["Answer"] = "The query failed or timed out."
+                else:
+                    rows[index]["Rows"] = len(result_df)
+                    rows[index]["Answer"] = f"See result '{intent}'"
+                    if result_df.attrs.get("truncated"):
+                        rows[index]["Answer"] += f" (first {len(result_df)} rows)"
+
+    # Send the remaining questions to the model in batches, skipping cached answers
+    ai_indexes = [index for index, row in enumerate(rows) if row["Intent"] is None]
+    ctx_hash = answer_context_hash(False)
+    pending = []
+    for index in ai_indexes:
+        cached = answer_cache.get(questions[index], docs[index].vector, ctx_hash) if answer_cache else None
+        if cached is None:
+            pending.append(index)
+        else:
+            rows[index]["Answer"] = cached
+            rows[index]["Answer_ms"] = 0.0
+
+    if pending:
+        handler = handler_factory() if handler_factory else None
+        if handler is None or not handler.is_available():
+            for index in pending:
+                rows[index]["Answer_Type"] = "error"
+                rows[index]["Answer"] = "AI model is not available."
+        else:
+            for start in range(0, len(pending), ai_batch_size):
+                batch = pending[start:start + ai_batch_size]
+                started = time.perf_counter()
+                responses = handler.generate_responses([questions[i] for i in batch], use_context=False,
+                                                       batch_size=ai_batch_size)
+                batch_ms = (time.perf_counter() - started) * 1000
+                for index, response in zip(batch, responses):
+                    rows[index]["Answer"] = response
+                    rows[index]["Answer_ms"] = round(batch_ms / len(batch), 1)
+                    if response.startswith(("Error generating response", "AI model is not initialized")):
+                        rows[index]["Answer_Type"] = "error"
+                    elif answer_cache is not None:
+                        answer_cache.put(questions[index], docs[index].vector, ctx_hash, response)
+
+    summary = pd.DataFrame(rows)
+    summary["Total_ms"] = summary["Classify_ms"] + summary["Answer_ms"].fillna(0.0)
+    return summary, {intent: df for intent, df in results.items() if df is not None}
+
+
+def write_results(path: str, summary: pd.DataFrame, results: dict):
+    """
+    Write the batch results.
+
+    An .xlsx output holds a Summary sheet and one sheet per intent result. Any other
+    output is written as a summary CSV plus one <name>_<intent>.csv file per result.
+
+    Args:
+        path (str): Output file path.
+        summary (DataFrame): One row per question.
+        results (dict): Intent -> result DataFrame.
+    """
+    if path.lower().endswith(".xlsx"):
+        with pd.ExcelWriter(path) as writer:
+            summary.to_excel(writer, sheet_name="Summary", index=False)
+            for intent, result_df in results.items():
+                result_df.to_excel(writer, sheet_name=intent[:31], index=False)
+    else:
+        summary.to_csv(path, index=False)
+        stem = os.path.splitext(path)[0]
+        for intent, result_df in results.items():
+            result_df.to_csv(f"{stem}_{intent}.csv", index=False)
+
+
+def _create_handler():
+    worker_address = os.environ.get("FRAUDGUARD_MODEL_WORKER")
+    if worker_address:
+        from model_worker import RemoteMistralHandler, parse_address
+        return RemoteMistralHandler(parse_address(worker_address))
+    from phi2_utils import MistralHandler
+    return MistralHandler()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of fraud analysis questions")
+    parser.add_argument("questions", help="Text file with one question per line, or CSV with a 'question' column")
+    parser.add_argument("--server", required=True)
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--output", default="batch_results.xlsx")
+    parser.add_argument("--intents", default=os.environ.get("FRAUDGUARD_INTENTS_FILE", "intents.json"))
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS)
+    parser.add_argument("--ai-batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    nlp = load_spacy_model()
+    catalog = IntentCatalog(nlp, args.intents).snapshot
+    cache_path = os.environ.get("FRAUDGUARD_ANSWER_CACHE")
+    summary, results = run_batch(
+        questions, args.server, args.database, nlp, catalog,
+        handler_factory=_create_handler,
+        answer_cache=AnswerCache(path=cache_path) if cache_path else None,
+        timeout=args.timeout, max_rows=args.max_rows, ai_batch_size=args.ai_batch_size
+    )
+    write_results(args.output, summary, results)
+    print(f"Answered {len(questions)} questions ({len(results)} distinct queries) -> {args.output}")
@@ -0,0 +1,257 @@
+"""
+Answer Cache Module
+
+This module provides a semantic cache for AI answers so that repeated or
+paraphrased questions can be served without running the model again.
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+import numpy as np
+
+# Words that do not change what a question asks for; every other word, number and
+# date must match for a cached answer to be reused
+IGNORED_WORDS = frozenset("""
+    a an the and or of in on at to for from by with about into per as is are was were be been
+    being am do does did have has had i me my we us our you your it its this that these those
+    there here s please show display list give tell get find see let can could would should will
+    shall may might must just also most some
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+
+def key_terms(question: str) -> frozenset:
+    """
+    Return the words and numbers of a question that a cached answer must share.
+
+    Averaged word vectors barely change when one entity is swapped ("fraud in March"
+    vs "fraud in April"), so the vector match alone cannot tell such questions apart.
+
+    Args:
+        question (str): The question text.
+
+    Returns:
+        frozenset: Lowercased terms, with plurals folded and thousands separators removed.
+    """
+    terms = set()
+    for token in TOKEN_PATTERN.findall(question.lower()):
+        token = token.replace(",", "")
+        if token in IGNORED_WORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss") and token[-2].isalpha():
+            token = token[:-1]
+        terms.add(token)
+    return frozenset(terms)
+
+
+def context_hash(*parts) -> str:
+    """
+    Build a stable hash for the data context an answer was generated with.
+
+    Args:
+        *parts: Values that influence the answer (e.g., use_context flag, data summary).
+
+    Returns:
+        str: Hex digest identifying the context.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part if part is not None else "").encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def answer_context_hash(use_context: bool, extra_context: str = "", catalog_version=None,
+                        conversation: list = None) -> str:
+    """
+    Build the context hash for an AI answer, the same way for every caller sharing a cache.
+
+    Args:
+        use_context (bool): Whether the fraud context was used in the prompt.
+        extra_context (str): Data summary passed to the model, if any.
+        catalog_version: Intent catalog version described in the prompt, if use_context.
+        conversation (list): Earlier questions of the conversation, oldest first.
+
+    Returns:
+        str: Hex digest identifying the context.
+    """
+    return context_hash(use_context, extra_context, catalog_version if use_context else None,
+                        "\x1e".join(conversation or []))
+
+
+class AnswerCache:
+    """
+    Nearest-neighbour answer cache keyed by question embedding and data context.
+
+    Entries are held in a NumPy matrix of unit-normalised question vectors. A lookup
+    returns the answer of the most similar cached question with the same context hash
+    and the same key_terms(), provided the cosine similarity reaches the threshold. The
+    least recently used entry is evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.92, path: str = None):
+        """
+        Initialize the answer cache.
+
+        Args:
+            max_entries (int): Maximum number of cached answers.
+            threshold (float): Minimum cosine similarity for a cache hit.
+            path (str): Optional .npz file used to persist the cache between sessions.
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.path = path
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._questions = []
+        self._contexts = []
+        self._answers = []
+        # Row index -> None, ordered from least to most recently used
+        self._lru = OrderedDict()
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def __len__(self):
+        return len(self._answers)
+
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(self, question: str, vector, ctx_hash: str):
+        """
+        Look up a cached answer for the question.
+
+        Args:
+            question (str): The user's question.
+            vector: Embedding of the question (e.g., spaCy Doc.vector).
+            ctx_hash (str): Hash of the data context, see context_hash().
+
+        Returns:
+            str or None: The cached answer, or None on a miss.
+        """
+        with self._lock:
+            if not self._answers:
+                return None
+            normalized = self._normalize_question(question)
+            contexts = np.asarray(self._contexts)
+            same_context = np.flatnonzero(contexts == ctx_hash)
+            if same_context.size == 0:
+                return None
+
+            # Exact repeats are served even when the question has no usable vector
+            for row in same_context:
+                if self._questions[row] == normalized:
+                    self._lru.move_to_end(int(row))
+                    return self._answers[row]
+
+            query = self._unit(vector)
+            if not query.any() or query.shape[0] != self._vectors.shape[1]:
+                return None
+            scores = self._vectors[same_context] @ query
+            terms = key_terms(question)
+            for best in np.argsort(-scores):
+                if scores[best] < self.threshold:
+                    break
+                row = int(same_context[best])
+                if key_terms(self._questions[row]) == terms:
+                    self._lru.move_to_end(row)
+                    return self._answers[row]
+            return None
+
+    def put(self, question: str, vector, ctx_hash: str, answer: str):
+        """
+        Store an answer in the cache, evicting the least recently used entry if full.
+
+        Args:
+            question (str): The user's question.
+            vector: Embedding of the question.
+            ctx_hash (str): Hash of the data context, see context_hash().
+            answer (str): The generated answer.
+        """
+        unit = self._unit(vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != unit.shape[0]:
+                self._clear()
+                self._vectors = np.empty((0, unit.shape[0]), dtype=np.float32)
+
+            if len(self._answers) >= self.max_entries:
+                row = next(iter(self._lru))
+                self._vectors[row] = unit
+                self._questions[row] = self._normalize_question(question)
+                self._contexts[row] = ctx_hash
+                self._answers[row] = answer
+                self._lru.move_to_end(row)
+            else:
+                self._vectors = np.vstack([self._vectors, unit[np.newaxis, :]])
+                self._questions.append(self._normalize_question(question))
+                self._contexts.append(ctx_hash)
+                self._answers.append(answer)
+                self._lru[len(self._answers) - 1] = None
+
+        if self.path:
+            self.save()
+
+    def _clear(self):
+        self._vectors = None
+        self._questions = []
+        self._contexts = []
+        self._answers = []
+        self._lru = OrderedDict()
+
+    def clear(self):
+        """Remove all cached answers."""
+        with self._lock:
+            self._clear()
+
+    def save(self):
+        """Persist the cache to self.path, keeping the LRU order."""
+        if not self.path:
+            return
+        with self._lock:
+            if self._vectors is None:
+                return
+            order = np.fromiter(self._lru.keys(), dtype=np.int64, count=len(self._lru))
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    vectors=self._vectors[order],
+                    questions=np.asarray(self._questions, dtype=str)[order],
+                    contexts=np.asarray(self._contexts, dtype=str)[order],
+                    answers=np.asarray(self._answers, dtype=str)[order],
+                )
+            os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Load the cache from self.path, replacing any in-memory entries."""
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                vectors = data["vectors"].astype(np.float32)
+                questions = data["questions"].tolist()
+                contexts = data["contexts"].tolist()
+                answers = data["answers"].tolist()
+        except Exception as e:
+            print(f"Error loading answer cache: {e}")
+            return
+
+        keep = min(len(answers), self.max_entries)
+        start = len(answers) - keep  # Drop the least recently used rows first
+        with self._lock:
+            self._vectors = vectors[start:]
+            self._questions = questions[start:]
+            self._contexts = contexts[start:]
+            self._answers = answers[start:]
+            self._lru = OrderedDict((row, None) for row in range(keep))
@@ -0,0 +1,101 @@
+"""
+Intent Catalog Module
+
+This module keeps the intent catalog and its spaCy example embeddings in memory,
+reloading them when the catalog file changes. Only added or changed examples are
+re-embedded, and the new index replaces the old one in a single assignment so
+questions being answered keep using the snapshot they started with.
+"""
+
+from collections import namedtuple
+import os
+import threading
+from supported_questions import load_intents
+
+# An immutable view of the catalog: take it once per question and use it throughout
+IntentSnapshot = namedtuple("IntentSnapshot", ["version", "intents", "intent_docs"])
+
+
+class IntentCatalog:
+    """Hot-reloadable intent catalog with incremental re-embedding of examples."""
+
+    def __init__(self, nlp, path: str = None):
+        """
+        Initialize the catalog and embed its examples.
+
+        Args:
+            nlp: Loaded spaCy model.
+            path (str): Path of the JSON catalog file; the built-in INTENTS are used
+                until it exists.
+        """
+        self.nlp = nlp
+        self.path = path
+        self._docs = {}  # Example text -> spaCy Doc
+        self._reload_lock = threading.Lock()
+        self._file_signature = None
+        self._watch_stop = None
+        self.snapshot = IntentSnapshot(0, {}, {})
+        self.reload()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except (OSError, TypeError):
+            return None
+
+    def reload(self) -> bool:
+        """
+        Reload the catalog file and swap in the new index.
+
+        Returns:
+            bool: True if the catalog was reloaded, False if loading failed.
+        """
+        with self._reload_lock:
+            signature = self._signature()
+            try:
+                intents = load_intents(self.path)
+            except Exception as e:
+                print(f"Error loading intent catalog, keeping the current one: {e}")
+                self._file_signature = signature
+                return False
+
+            texts = {text for data in intents.values() for text in data["examples"]}
+            new_texts = [text for text in texts if text not in self._docs]
+            # Embed only examples that are new or were edited
+            docs = {text: doc for text, doc in self._docs.items() if text in texts}
+            docs.update(zip(new_texts, self.nlp.pipe(new_texts)))
+
+            intent_docs = {
+                intent: [docs[text] for text in data["examples"]]
+                for intent, data in intents.items()
+            }
+            self._docs = docs
+            self._file_signature = signature
+            self.snapshot = IntentSnapshot(self.snapshot.version + 1, intents, intent_docs)
+            if self.snapshot.version > 1:
+                print(f"Intent catalog reloaded: {len(intents)} intents, {len(new_texts)} examples embedded.")
+            return True
+
+    def check_for_changes(self) -> bool:
+        """Reload the catalog if its file changed since the last load."""
+        if self._signature() == self._file_signature:
+            return False
+        return self.reload()
+
+    def start_watching(self, interval: float = 2.0):
+        """Check the catalog file for changes every interval seconds in the background."""
+        if self._watch_stop is not None:
+            return
+        stop = self._watch_stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                self.check_for_changes()
+
+        threading.Thread(target=watch, daemon=True).start()
+
+    def stop_watching(self):
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
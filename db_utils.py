@@ -1,6 +1,13 @@
 import pyodbc
 import pandas as pd
 import warnings
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# In-flight queries keyed by connection, query and limits, shared by all callers
+_inflight = {}
+_inflight_lock = threading.Lock()
 
 def establish_connection(server: str, database: str):
     drivers = pyodbc.drivers()
@@ -14,15 +21,232 @@ def establish_connection(server: str, database: str):
     )
     return pyodbc.connect(conn_str)
 
-def run_query(server: str, database: str, query: str):
-    conn = establish_connection(server, database)
+class QueryHandle:
+    """
+    Lets another thread cancel a running query on the server.
+
+    Pass a handle to run_query and call cancel() from any thread; the running
+    pyodbc statements are cancelled and run_query returns None. One handle may
+    be shared by several queries running at the same time.
+    """
+
+    def __init__(self):
+        self._cursors = set()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def _on_cancel(self, callback):
+        """Call callback once when the handle is cancelled, right away if it already is."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def _attach(self, cursor) -> bool:
+        """Track the cursor; returns False if the handle was cancelled before it could run."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._cursors.add(cursor)
+            return True
+
+    def _detach(self, cursor):
+        with self._lock:
+            self._cursors.discard(cursor)
+
+    def cancel(self):
+        """Cancel the running statements, and stop any later ones from starting."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+            for cursor in self._cursors:
+                try:
+                    cursor.cancel()
+                except Exception as e:
+                    print(f"Error cancelling query:\n{e}")
+        for callback in callbacks:
+            callback()
+
+def run_query(server: str, database: str, query: str, params=None, timeout: int = None,
+              max_rows: int = None, handle: QueryHandle = None):
+    """
+    Run a query and return its first result set as a DataFrame.
+
+    Args:
+        server (str): SQL Server name.
+        database (str): Database name.
+        query (str): The SQL query to run.
+        params (list): Optional query parameters.
+        timeout (int): Statement timeout in seconds; no timeout if not given.
+        max_rows (int): Row budget; at most this many rows are fetched and
+            df.attrs["truncated"] is set if the query had more.
+        handle (QueryHandle): Optional handle for cancelling the query.
+
+    Returns:
+        DataFrame or None: The query result, or None if the query failed or was cancelled.
+    """
+    if handle is not None and handle.cancelled:
+        return None
+    conn = None
+    cursor = None
     try:
+        conn = establish_connection(server, database)
+        if timeout:
+            conn.timeout = int(timeout)
+        cursor = conn.cursor()
+        # A cancel that arrives before execute has no statement to stop, so skip the query instead
+        if handle is not None and (not handle._attach(cursor) or handle.cancelled):
+            print("Query cancelled.")
+            return None
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        # Skip row counts and other results without columns
+        while cursor.description is None and cursor.nextset():
+            pass
+        if cursor.description is None:
+            return pd.DataFrame()
+
+        columns = [column[0] for column in cursor.description]
+        truncated = False
+        if max_rows:
+            rows = cursor.fetchmany(max_rows + 1)
+            truncated = len(rows) > max_rows
+            rows = rows[:max_rows]
+            if truncated:
+                cursor.cancel()  # Stop the server from producing the rest
+        else:
+            rows = cursor.fetchall()
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            df = pd.read_sql(query, conn)
+            df = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns, coerce_float=True)
+        df.attrs["truncated"] = truncated
         return df
     except Exception as e:
-        print(f"Error executing query:\n{e}")
+        if handle is not None and handle.cancelled:
+            print("Query cancelled.")
+        else:
+            print(f"Error executing query:\n{e}")
         return None
     finally:
-        conn.close()
\ No newline at end of file
+        if handle is not None and cursor is not None:
+            handle._detach(cursor)
+        if conn is not None:
+            conn.close()
+
+class _SharedRun:
+    """One in-flight run of a query and the callers still waiting for it."""
+
+    def __init__(self):
+        self.future = Future()
+        self.handle = QueryHandle()  # Cancels the statement once nobody wants the result
+        self.interested = 0
+        self.abandoned = False
+
+def _release_run(run: _SharedRun):
+    with _inflight_lock:
+        run.interested -= 1
+        if run.interested > 0 or run.future.done():
+            return
+        run.abandoned = True
+    run.handle.cancel()
+
+def run_query_shared(server: str, database: str, query: str, **kwargs):
+    """
+    Run a query, coalescing identical requests that are already in flight.
+
+    If the same query is already running against the same server and database,
+    the caller waits for that run and receives its result instead of starting a
+    second one. A query is only shared with callers passing the same limits.
+    Cancelling a caller's handle returns None to that caller only; the statement
+    is cancelled on the server once every caller waiting for it has cancelled, and
+    a caller arriving after that starts a new run.
+
+    Args:
+        server (str): SQL Server name.
+        database (str): Database name.
+        query (str): The SQL query to run.
+        **kwargs: params, timeout, max_rows and handle, as for run_query.
+
+    Returns:
+        DataFrame or None: The query result, or None if the query failed or this
+        caller cancelled it.
+    """
+    handle = kwargs.pop("handle", None)
+    if handle is not None and handle.cancelled:
+        return None
+    params = kwargs.get("params")
+    key = (server, database, query, tuple(params or ()), kwargs.get("timeout"), kwargs.get("max_rows"))
+    with _inflight_lock:
+        run = _inflight.get(key)
+        owner = run is None or run.abandoned
+        if owner:
+            run = _SharedRun()
+            _inflight[key] = run
+        run.interested += 1
+
+    finished = threading.Event()
+    run.future.add_done_callback(lambda _: finished.set())
+    if handle is not None:
+        def detach():
+            _release_run(run)
+            finished.set()
+        handle._on_cancel(detach)
+
+    if owner:
+        try:
+            run.future.set_result(run_query(server, database, query, handle=run.handle, **kwargs))
+        except Exception as e:
+            run.future.set_exception(e)
+        finally:
+            with _inflight_lock:
+                if _inflight.get(key) is run:
+                    _inflight.pop(key, None)
+
+    finished.wait()
+    if handle is not None and handle.cancelled:
+        return None
+    return run.future.result()
+
+def run_queries_parallel(server: str, database: str, queries: dict, max_workers: int = 4,
+                         timings: dict = None, **kwargs):
+    """
+    Run several queries concurrently, each on its own connection.
+
+    Args:
+        server (str): SQL Server name.
+        database (str): Database name.
+        queries (dict): Mapping of name to SQL query.
+        max_workers (int): Maximum number of queries running at once.
+        timings (dict): Optional dict that receives the seconds each query took, by name.
+        **kwargs: timeout and max_rows, applied to every query.
+
+    Returns:
+        dict: Mapping of name to DataFrame (or None if that query failed).
+    """
+    if not queries:
+        return {}
+
+    def timed(name, query):
+        started = time.perf_counter()
+        try:
+            return run_query_shared(server, database, query, **kwargs)
+        finally:
+            if timings is not None:
+                timings[name] = time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as executor:
+        futures = {name: executor.submit(timed, name, query) for name, query in queries.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Error executing query '{name}':\n{e}")
+                results[name] = None
+        return results
@@ -0,0 +1,56 @@
+"""
+Email Utilities Module
+
+This module sends query results as Excel attachments over SMTP.
+"""
+
+import os
+import smtplib
+import tempfile
+from email.message import EmailMessage
+
+SMTP_SERVER = "smtp.gmail.com"
+SMTP_PORT = 587
+
+
+def send_dataframe_email(df, sender: str, password: str, recipient: str,
+                         subject: str = "FraudGuard Analysis Results",
+                         body: str = "Please find the fraud analysis results attached.",
+                         file_name: str = "results.xlsx"):
+    """
+    Send a DataFrame as an Excel attachment.
+
+    Args:
+        df (DataFrame): The results to attach.
+        sender (str): Sender email address, also used as the SMTP login.
+        password (str): SMTP password for the sender.
+        recipient (str): Recipient email address (comma-separated for several).
+        subject (str): Email subject.
+        body (str): Email body text.
+        file_name (str): Name of the attached Excel file.
+
+    Raises:
+        Exception: If the email could not be sent.
+    """
+    # Save DataFrame to a temporary Excel file
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        df.to_excel(tmp_path, index=False)
+
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = sender
+        msg["To"] = recipient
+        msg.set_content(body)
+
+        with open(tmp_path, "rb") as f:
+            file_data = f.read()
+            msg.add_attachment(file_data, maintype="application", subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename=file_name)
+
+        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+            server.starttls()
+            server.login(sender, password)
+            server.send_message(msg)
+    finally:
+        os.remove(tmp_path)
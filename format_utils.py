@@ -0,0 +1,138 @@
+"""
+Table Formatting Module
+
+This module renders DataFrames as psql-style text tables, the layout produced by
+tabulate(df, headers='keys', tablefmt='psql', showindex=False). Whole columns are
+converted and padded at once with pandas string operations instead of cell by cell,
+and row ranges can be rendered on demand with consistent column widths.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Numbers with thousands separators, e.g. SQL Server FORMAT(..., 'N0') output
+THOUSANDS_PATTERN = r"[+-]?\d{1,3}(?:,\d{3})+(?:\.\d*)?"
+
+
+class TableFormatter:
+    """
+    Formats a DataFrame as a psql-style table.
+
+    Cell strings and column widths are computed once for the whole frame, so any
+    row range formatted later lines up with the rest of the table.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Prepare the cell strings and column widths.
+
+        Args:
+            df (DataFrame): The data to format.
+        """
+        self.headers = [str(column) for column in df.columns]
+        self.columns = []
+        self.numeric = []
+        for position in range(df.shape[1]):
+            cells, numeric = self._column_strings(df.iloc[:, position])
+            self.columns.append(cells)
+            self.numeric.append(numeric)
+        self.widths = [
+            # Headers get two extra characters of room, as in tabulate's psql format
+            max(len(header) + 2, int(cells.str.len().max()) if len(cells) else 0)
+            for header, cells in zip(self.headers, self.columns)
+        ]
+        self.row_count = len(df)
+
+    @staticmethod
+    def _column_strings(column: pd.Series):
+        """Convert a column to strings; return them and whether the column is numeric."""
+        values = column.reset_index(drop=True)
+        missing = values.isna()
+
+        if pd.api.types.is_bool_dtype(values):
+            return values.astype(str), False
+
+        if pd.api.types.is_integer_dtype(values):
+            return values.astype(str).where(~missing, "nan"), True
+
+        if pd.api.types.is_float_dtype(values):
+            array = values.to_numpy(dtype=float, na_value=np.nan)
+            strings = pd.Series(np.char.mod("%g", array), dtype=object)
+            return TableFormatter._align_decimals(strings), True
+
+        if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            strings = values.astype(object).where(~missing, "nan").astype(str)
+            # Columns holding only numbers (or numeric strings) are aligned as numbers, as tabulate does
+            present = values[~missing]
+            if len(present) and not present.map(lambda v: isinstance(v, bool)).any():
+                text = present.astype(str)
+                if (pd.to_numeric(text, errors="coerce").notna() | text.str.fullmatch(THOUSANDS_PATTERN)).all():
+                    return TableFormatter._align_decimals(strings), True
+            return strings, False
+
+        if pd.api.types.is_datetime64_dtype(values) and not missing.any() \
+                and ((values.dt.microsecond == 0) & (values.dt.nanosecond == 0)).all():
+            # Same text as str(Timestamp), without a Python call per value
+            return values.dt.strftime("%Y-%m-%d %H:%M:%S"), False
+
+        # Other types are shown as str() of each value
+        return values.astype(object).map(str), False
+
+    @staticmethod
+    def _align_decimals(strings: pd.Series) -> pd.Series:
+        """Pad numbers on the right so their decimal points (or exponents) line up."""
+        if strings.empty:
+            return strings
+        lengths = strings.str.len()
+        points = strings.str.rfind(".")
+        points = points.where(points >= 0, strings.str.lower().str.rfind("e"))
+        after = (lengths - points - 1).where(points >= 0, -1)
+        padding = (int(after.max()) - after).astype(int)
+        return strings + pd.Series(" ", index=strings.index, dtype=object).str.repeat(padding)
+
+    def _border(self, joint: str, edge: str) -> str:
+        return edge + joint.join("-" * (width + 2) for width in self.widths) + edge
+
+    def _header_line(self) -> str:
+        cells = [
+            header.rjust(width) if numeric else header.ljust(width)
+            for header, width, numeric in zip(self.headers, self.widths, self.numeric)
+        ]
+        return "| " + " | ".join(cells) + " |"
+
+    def format(self, start: int = None, stop: int = None) -> str:
+        """
+        Format the table, or only the rows in [start, stop).
+
+        Args:
+            start (int): First row to include; from the beginning if not given.
+            stop (int): Row to stop before; to the end if not given.
+
+        Returns:
+            str: The psql-style table text.
+        """
+        lines = [self._border("+", "+"), self._header_line(), self._border("+", "|")]
+        if self.columns:
+            rows = None
+            for cells, width, numeric in zip(self.columns, self.widths, self.numeric):
+                padded = cells.iloc[start:stop].str.pad(width, side="left" if numeric else "right")
+                rows = "| " + padded if rows is None else rows + " | " + padded
+            if rows is not None and len(rows):
+                lines.append("\n".join((rows + " |").tolist()))
+        lines.append(self._border("+", "+"))
+        return "\n".join(lines)
+
+
+def format_table(df: pd.DataFrame, start: int = None, stop: int = None) -> str:
+    """
+    Format a DataFrame as a psql-style text table.
+
+    Args:
+        df (DataFrame): The data to format.
+        start (int): First row to include; from the beginning if not given.
+        stop (int): Row to stop before; to the end if not given.
+
+    Returns:
+        str: The psql-style table text.
+    """
+    return TableFormatter(df).format(start, stop)
@@ -0,0 +1,447 @@
+"""
+Shared Model Worker Module
+
+This module runs the Phi-2 model in a separate worker process that several GUI
+instances on the same host reach over a local socket, so a single loaded model
+serves every session and a model crash does not take down the GUI.
+
+Usage:
+    python model_worker.py [--host 127.0.0.1] [--port 8765]
+
+The GUI uses the worker when FRAUDGUARD_MODEL_WORKER is set (e.g. "127.0.0.1:8765")
+and starts it automatically if it is not running. In the packaged app the worker is
+started as "app_gui.exe --model-worker --port 8765", since model_worker.py is not shipped. Connections are authenticated with
+FRAUDGUARD_WORKER_AUTHKEY, or else with a random key kept in a file only the current
+user can read; the worker refuses to start without a key.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+import argparse
+import itertools
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+WORKER_FLAG = "--model-worker"  # Runs the packaged app as the worker
+AUTHKEY_FILE = os.path.join(os.path.expanduser("~"), ".fraudguard", "worker_authkey")
+
+
+def parse_address(address: str):
+    """Parse "host:port" into a (host, port) tuple."""
+    host, _, port = address.rpartition(":")
+    return (host or DEFAULT_HOST, int(port))
+
+
+def load_authkey(path: str = AUTHKEY_FILE) -> bytes:
+    """
+    Return the key that authenticates connections to the worker.
+
+    The connection unpickles every message, so anyone holding the key can run code as
+    the worker's user; there is deliberately no built-in default.
+
+    Args:
+        path (str): Key file used when FRAUDGUARD_WORKER_AUTHKEY is not set. It is
+            created with a random key, readable only by the current user, if missing.
+
+    Returns:
+        bytes: The key.
+
+    Raises:
+        RuntimeError: If no key is available or the key file is readable by other users.
+    """
+    key = os.environ.get("FRAUDGUARD_WORKER_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(secrets.token_hex(32))
+
+    if os.name == "posix" and os.stat(path).st_mode & 0o077:
+        raise RuntimeError(f"Worker key file {path} is accessible by other users; restrict it to mode 600.")
+    # Another process may have created the file and not written the key yet
+    for _ in range(50):
+        with open(path, "r", encoding="utf-8") as f:
+            key = f.read().strip()
+        if key:
+            return key.encode("utf-8")
+        time.sleep(0.1)
+    raise RuntimeError(f"Worker key file {path} is empty.")
+
+
+class ModelWorker:
+    """
+    Serves MistralHandler requests from any number of client connections.
+
+    Every connection may have several requests in flight; each response carries the
+    id of its request. Generation is serialized on the single loaded model, while
+    health checks are answered immediately.
+    """
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), max_pending: int = 16, authkey: bytes = None):
+        from phi2_utils import MistralHandler
+        self.address = address
+        self.authkey = authkey or load_authkey()
+        self.handler = MistralHandler()
+        self.model_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_pending)
+        self.started = time.time()
+        self.requests_served = 0
+
+    def _health(self) -> dict:
+        return {
+            "available": self.handler.is_available(),
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "requests_served": self.requests_served,
+        }
+
+    def _generate(self, kwargs: dict) -> str:
+        with self.model_lock:
+            response = self.handler.generate_response(**kwargs)
+            self.requests_served += 1
+            return response
+
+    def _generate_batch(self, kwargs: dict) -> list:
+        with self.model_lock:
+            responses = self.handler.generate_responses(**kwargs)
+            self.requests_served += len(responses)
+            return responses
+
+    def _handle_request(self, conn, send_lock, request: dict):
+        try:
+            op = request.get("op")
+            if op == "generate":
+                reply = {"id": request["id"], "result": self._generate(request.get("kwargs", {}))}
+            elif op == "record_turn":
+                self.handler.record_turn(**request.get("kwargs", {}))
+                reply = {"id": request["id"], "result": None}
+            elif op == "end_session":
+                self.handler.end_session(**request.get("kwargs", {}))
+                reply = {"id": request["id"], "result": None}
+            elif op == "generate_batch":
+                reply = {"id": request["id"], "result": self._generate_batch(request.get("kwargs", {}))}
+            elif op == "ping":
+                reply = {"id": request["id"], "result": self._health()}
+            else:
+                reply = {"id": request["id"], "error": f"Unknown operation: {op}"}
+        except Exception as e:
+            reply = {"id": request.get("id"), "error": str(e)}
+        try:
+            with send_lock:
+                conn.send(reply)
+        except (OSError, EOFError):
+            pass  # Client went away
+
+    def _serve_connection(self, conn):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                request = conn.recv()
+                if request.get("op") == "ping":
+                    self._handle_request(conn, send_lock, request)
+                else:
+                    self.executor.submit(self._handle_request, conn, send_lock, request)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        """Accept client connections until the process is stopped."""
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"Model worker listening on {self.address[0]}:{self.address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"Error accepting connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+
+class RemoteMistralHandler:
+    """
+    Drop-in replacement for MistralHandler that forwards requests to a ModelWorker.
+
+    The worker is started if it is not reachable, and restarted when the connection
+    to it is lost.
+    """
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), autostart: bool = True,
+                 request_timeout: float = 300.0, startup_timeout: float = 600.0):
+        """
+        Initialize the remote handler.
+
+        Args:
+            address (tuple): (host, port) of the worker.
+            autostart (bool): Start the worker process if it is not running.
+            request_timeout (float): Seconds to wait for a single response.
+            startup_timeout (float): Seconds to wait for a new worker to load the model.
+        """
+        self.address = address
+        self.autostart = autostart
+        self.request_timeout = request_timeout
+        self.startup_timeout = startup_timeout
+        try:
+            self.authkey = load_authkey()
+        except (OSError, RuntimeError) as e:
+            print(f"Model worker is disabled: {e}")
+            self.authkey = None
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count()
+        self._monitor_stop = None
+        self._worker_pid = None
+        self._ensure_connected()
+
+    def _connect(self) -> bool:
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except (OSError, EOFError, AuthenticationError):
+            return False
+        self._conn = conn
+        threading.Thread(target=self._read_responses, args=(conn,), daemon=True).start()
+        return True
+
+    def _start_worker(self):
+        print("Starting model worker...")
+        if getattr(sys, "frozen", False):
+            # Packaged app: sys.executable is the GUI, which runs the worker when given --model-worker
+            args = [sys.executable, WORKER_FLAG]
+        else:
+            args = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_worker.py")]
+        args += ["--host", self.address[0], "--port", str(self.address[1])]
+        if sys.platform == "win32":
+            flags = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+            subprocess.Popen(args, creationflags=flags, close_fds=True)
+        else:
+            subprocess.Popen(args, start_new_session=True, close_fds=True)
+
+    def _ensure_connected(self) -> bool:
+        with self._conn_lock:
+            if self._conn is not None:
+                return True
+            if self.authkey is None:
+                return False
+            if self._connect():
+                return True
+            if not self.autostart:
+                return False
+            self._start_worker()
+            # Another GUI may start a worker at the same time; whichever binds the port wins
+            deadline = time.time() + self.startup_timeout
+            while time.time() < deadline:
+                time.sleep(1.0)
+                if self._connect():
+                    return True
+            print("Model worker did not start in time.")
+            return False
+
+    def _fail_pending(self, message: str):
+        for request_id in list(self._pending):
+            future = self._pending.pop(request_id, None)
+            if future is not None and not future.done():
+                future.set_exception(ConnectionError(message))
+
+    def _drop_connection(self):
+        with self._conn_lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        self._fail_pending("Lost connection to model worker.")
+
+    def _kill_worker(self):
+        """Kill the last worker process seen, if it runs on this host."""
+        pid, self._worker_pid = self._worker_pid, None
+        if pid is None or self.address[0] not in ("127.0.0.1", "localhost", "::1"):
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            print(f"Error stopping model worker {pid}: {e}")
+
+    def _read_responses(self, conn):
+        try:
+            while True:
+                reply = conn.recv()
+                future = self._pending.pop(reply.get("id"), None)
+                if future is None:
+                    continue
+                if "error" in reply:
+                    future.set_exception(RuntimeError(reply["error"]))
+                else:
+                    future.set_result(reply["result"])
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._conn_lock:
+                if self._conn is conn:
+                    self._conn = None
+            conn.close()
+            # Fail every request that was waiting on this connection
+            self._fail_pending("Lost connection to model worker.")
+
+    def _call(self, op: str, timeout: float = None, **kwargs):
+        if not self._ensure_connected():
+            raise ConnectionError("Model worker is not reachable.")
+        request_id = next(self._ids)
+        future = Future()
+        self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self._conn.send({"id": request_id, "op": op, "kwargs": kwargs})
+        except (OSError, EOFError, AttributeError) as e:
+            self._pending.pop(request_id, None)
+            with self._conn_lock:
+                self._conn = None
+            raise ConnectionError(f"Lost connection to model worker: {e}")
+        try:
+            return future.result(timeout=timeout or self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)  # A late reply to a timed-out request is dropped
+
+    def health(self) -> dict:
+        """Return the worker's health report, or None if it is not reachable."""
+        try:
+            health = self._call("ping", timeout=10.0)
+        except Exception:
+            return None
+        self._worker_pid = health.get("pid")
+        return health
+
+    def is_available(self) -> bool:
+        """Check if the worker is reachable and its model is loaded."""
+        health = self.health()
+        return bool(health and health.get("available"))
+
+    def generate_response(self, question: str, use_context: bool = True, extra_context: str = "",
+                          intents: dict = None, session_id: str = None) -> str:
+        """
+        Generate a response on the worker, restarting it once if the connection is lost.
+
+        Args:
+            question (str): The user's question
+            use_context (bool): Whether to use the fraud context in the prompt
+            extra_context (str): Optional extra context (e.g., SQL data summary)
+            intents (dict): Intent catalog for the context prompt; defaults to INTENTS
+            session_id (str): Optional conversation id, see MistralHandler.generate_response
+        Returns:
+            str: The model's response
+        """
+        kwargs = {"question": question, "use_context": use_context, "extra_context": extra_context,
+                  "intents": intents, "session_id": session_id}
+        for attempt in range(2):
+            try:
+                return self._call("generate", **kwargs)
+            except ConnectionError as e:
+                if attempt == 1:
+                    return f"Error generating response: {str(e)}"
+            except Exception as e:
+                return f"Error generating response: {str(e)}"
+
+    def record_turn(self, session_id: str, question: str, answer: str):
+        """Add a turn answered without the model to a session on the worker."""
+        try:
+            self._call("record_turn", session_id=session_id, question=question, answer=answer)
+        except Exception as e:
+            print(f"Error recording session turn: {e}")
+
+    def end_session(self, session_id: str):
+        """Forget a session on the worker."""
+        if self._conn is None:
+            return  # A worker that has to be (re)started holds no sessions
+        try:
+            self._call("end_session", timeout=10.0, session_id=session_id)
+        except Exception as e:
+            print(f"Error ending session: {e}")
+
+    def generate_responses(self, questions: list, use_context: bool = True, extra_context: str = "",
+                           intents: dict = None, batch_size: int = 8) -> list:
+        """
+        Generate responses for several questions on the worker, see MistralHandler.generate_responses.
+        """
+        kwargs = {"questions": questions, "use_context": use_context, "extra_context": extra_context,
+                  "intents": intents, "batch_size": batch_size}
+        timeout = self.request_timeout * max(1, -(-len(questions) // batch_size))
+        for attempt in range(2):
+            try:
+                return self._call("generate_batch", timeout=timeout, **kwargs)
+            except ConnectionError as e:
+                if attempt == 1:
+                    return [f"Error generating response: {str(e)}"] * len(questions)
+            except Exception as e:
+                return [f"Error generating response: {str(e)}"] * len(questions)
+
+    def start_health_monitor(self, interval: float = 30.0, max_failures: int = 2):
+        """
+        Ping the worker every interval seconds in the background and restart it if it is down.
+
+        A worker that is still connected but misses max_failures pings in a row is
+        considered hung; it is killed and a new one is started.
+        """
+        if self._monitor_stop is not None:
+            return
+        stop = self._monitor_stop = threading.Event()
+
+        def monitor():
+            failures = 0
+            while not stop.wait(interval):
+                if self.health() is not None:
+                    failures = 0
+                    continue
+                failures += 1
+                hung = self._conn is not None
+                if hung and failures < max_failures:
+                    continue
+                print("Model worker is not responding; restarting it.")
+                self._drop_connection()
+                if hung:
+                    self._kill_worker()
+                failures = 0
+                self._ensure_connected()
+
+        threading.Thread(target=monitor, daemon=True).start()
+
+    def stop_health_monitor(self):
+        if self._monitor_stop is not None:
+            self._monitor_stop.set()
+            self._monitor_stop = None
+
+
+def main(argv: list = None):
+    """Run the worker from command-line arguments until the process is stopped."""
+    parser = argparse.ArgumentParser(description="FraudGuard shared Phi-2 model worker")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    try:
+        authkey = load_authkey()
+    except (OSError, RuntimeError) as e:
+        print(f"Model worker not started: {e}")
+        sys.exit(1)
+    ModelWorker((args.host, args.port), authkey=authkey).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
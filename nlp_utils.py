@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def load_spacy_model(model_name="en_core_web_md"):
     """
     Load the spaCy model for NLP tasks.
@@ -38,4 +41,38 @@ def detect_intent(user_question, intent_docs, nlp, threshold=0.75):
                 best_score = score
                 best_intent = intent
 
-    return best_intent if best_score >= threshold else None
\ No newline at end of file
+    return best_intent if best_score >= threshold else None
+
+
+def detect_intents(docs, intent_docs, threshold=0.75):
+    """
+    Match many questions to intents at once with a single cosine-similarity matrix.
+    Gives the same scores as detect_intent, which uses spaCy's Doc.similarity.
+
+    Args:
+        docs (list): spaCy Docs of the questions (e.g., from nlp.pipe).
+        intent_docs (dict): A dictionary of intents and their example documents.
+        threshold (float): Similarity threshold for intent detection.
+
+    Returns:
+        list: One (intent or None, best score) tuple per question.
+    """
+    labels = [intent for intent, examples in intent_docs.items() for _ in examples]
+    if not docs or not labels:
+        return [(None, 0.0)] * len(docs)
+
+    def unit_rows(vectors):
+        matrix = np.vstack(vectors).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Questions or examples without vectors get a similarity of 0, as in spaCy
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    examples = unit_rows([doc.vector for examples in intent_docs.values() for doc in examples])
+    questions = unit_rows([doc.vector for doc in docs])
+    scores = questions @ examples.T
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(docs)), best]
+    return [
+        (labels[index] if score >= threshold else None, float(score))
+        for index, score in zip(best, best_scores)
+    ]
@@ -5,15 +5,27 @@ This module handles the integration with AI models for natural language processi
 of questions that don't match predefined SQL queries.
 """
 
+from collections import OrderedDict
+import threading
 from transformers import AutoModelForCausalLM, AutoTokenizer
 import torch
 from supported_questions import INTENTS
 
+# Conversation sessions: how many are held in memory, how many tokens each may keep cached,
+# and the memory all session KV caches may use together (Phi-2 in fp16 takes ~320 KB per token)
+MAX_SESSIONS = 8
+SESSION_MAX_TOKENS = 1024
+SESSION_CACHE_MB = 512
+MAX_NEW_TOKENS = 64
+MAX_SESSION_TURNS = 32  # Turns kept as text for re-encoding after the window fills
+
 class MistralHandler:
     _instance = None
     _model = None
     _tokenizer = None
     _initialized = False
+    _sessions = OrderedDict()
+    _session_lock = threading.Lock()
 
     def __new__(cls, model_name="microsoft/phi-2"):
         if cls._instance is None:
@@ -65,12 +77,13 @@ class MistralHandler:
         except Exception as e:
             print(f"Error initializing AI model: {e}")
 
-    def _create_context_prompt(self, question: str) -> str:
+    def _create_context_prompt(self, question: str, intents: dict = None) -> str:
         """
         Create a context-aware prompt that includes information about supported questions and their SQL queries.
         
         Args:
             question (str): The user's question
+            intents (dict): Intent catalog to describe; defaults to INTENTS
             
         Returns:
             str: The context-aware prompt
@@ -78,7 +91,7 @@ class MistralHandler:
         # Create a context about supported questions and their SQL queries
         context = "I am a fraud analysis assistant. I know the following questions and their SQL queries:\n"
         
-        for intent, data in INTENTS.items():
+        for intent, data in (intents or INTENTS).items():
             context += f"\n- {intent.replace('_', ' ').title()}:\n"
             context += "  Examples:\n"
             for example in data["examples"]:
@@ -94,7 +107,8 @@ class MistralHandler:
         
         return f"{context}Q: {question}\nA:"
 
-    def generate_response(self, question: str, use_context: bool = True, extra_context: str = "") -> str:
+    def generate_response(self, question: str, use_context: bool = True, extra_context: str = "",
+                          intents: dict = None, session_id: str = None) -> str:
         """
         Generate a response using the AI model.
         
@@ -102,6 +116,9 @@ class MistralHandler:
             question (str): The user's question
             use_context (bool): Whether to use the fraud context in the prompt
             extra_context (str): Optional extra context (e.g., SQL data summary)
+            intents (dict): Intent catalog for the context prompt; defaults to INTENTS
+            session_id (str): Optional conversation id; follow-up questions in the same
+                session see the earlier turns
         Returns:
             str: The model's response
         """
@@ -109,19 +126,64 @@ class MistralHandler:
             return "AI model is not initialized. Please check the model installation."
 
         try:
-            # Create a context-aware prompt only if use_context is True
-            if use_context:
-                prompt = self._create_context_prompt(question)
-            else:
-                prompt = f"Q: {question}\nA:"
-            # Prepend extra context if provided
-            if extra_context and str(extra_context).strip():
-                prompt = f"Here is the latest data:\n{str(extra_context)}\n\n" + prompt
+            if session_id is not None:
+                return self._generate_in_session(session_id, question, use_context, extra_context, intents)
+            prompt = self._build_prompt(question, use_context, extra_context, intents)
+            return self._generate([prompt])[0]
+        except Exception as e:
+            print(f"Error in generate_response: {str(e)}")
+            return f"Error generating response: {str(e)}"
+
+    def generate_responses(self, questions: list, use_context: bool = True, extra_context: str = "",
+                           intents: dict = None, batch_size: int = 8) -> list:
+        """
+        Generate responses for several questions, running them through the model in batches.
+        
+        Args:
+            questions (list): The questions to answer
+            use_context (bool): Whether to use the fraud context in the prompts
+            extra_context (str): Optional extra context (e.g., SQL data summary)
+            intents (dict): Intent catalog for the context prompt; defaults to INTENTS
+            batch_size (int): Number of questions generated together
+        Returns:
+            list: The model's responses, in the order of the questions
+        """
+        if not self._model or not self._tokenizer:
+            return ["AI model is not initialized. Please check the model installation."] * len(questions)
+
+        responses = []
+        for start in range(0, len(questions), batch_size):
+            batch = questions[start:start + batch_size]
+            try:
+                prompts = [self._build_prompt(q, use_context, extra_context, intents) for q in batch]
+                responses.extend(self._generate(prompts))
+            except Exception as e:
+                print(f"Error in generate_responses: {str(e)}")
+                responses.extend([f"Error generating response: {str(e)}"] * len(batch))
+        return responses
+
+    def _build_prompt(self, question: str, use_context: bool, extra_context: str, intents: dict = None) -> str:
+        """Build the prompt for a question."""
+        # Create a context-aware prompt only if use_context is True
+        if use_context:
+            prompt = self._create_context_prompt(question, intents)
+        else:
+            prompt = f"Q: {question}\nA:"
+        # Prepend extra context if provided
+        if extra_context and str(extra_context).strip():
+            prompt = f"Here is the latest data:\n{str(extra_context)}\n\n" + prompt
+        return prompt
 
+    def _generate(self, prompts: list) -> list:
+        """Run a batch of prompts through the model and return the post-processed responses."""
+        # Pad on the left so every prompt ends right where generation starts
+        padding_side = self._tokenizer.padding_side
+        self._tokenizer.padding_side = "left"
+        try:
             # Generate response with optimized parameters for speed
             with torch.no_grad():  # Disable gradient calculation
                 inputs = self._tokenizer(
-                    prompt,
+                    prompts,
                     return_tensors="pt",
                     padding=True,
                     truncation=True,
@@ -133,7 +195,7 @@ class MistralHandler:
                     
                 outputs = self._model.generate(
                     **inputs,
-                    max_new_tokens=64,       # Reduced for faster responses
+                    max_new_tokens=MAX_NEW_TOKENS,  # Reduced for faster responses
                     temperature=0.3,         # Lower for more focused responses
                     do_sample=False,         # Disable sampling for faster generation
                     num_beams=1,             # Single beam for faster generation
@@ -143,18 +205,161 @@ class MistralHandler:
                     length_penalty=1.0,       # Neutral length penalty
                     no_repeat_ngram_size=3   # Prevent repetition of phrases
                 )
-            
-            response = self._tokenizer.decode(outputs[0], skip_special_tokens=True)
+        finally:
+            self._tokenizer.padding_side = padding_side
+
+        responses = []
+        for output in outputs:
+            response = self._tokenizer.decode(output, skip_special_tokens=True)
             # Extract only the model's response (remove the prompt)
             response = response.split("A:")[-1].strip()
             
             # Post-process the response
-            response = self._post_process_response(response)
-            
+            responses.append(self._post_process_response(response))
+        return responses
+
+    def _get_session(self, session_id: str) -> dict:
+        """Return the session, creating it and evicting the least recently used one if needed."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {"input_ids": None, "past_key_values": None, "turns": [], "pending": "", "extra_context": "",
+                       "reencode": False}
+            self._sessions[session_id] = session
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _generate_in_session(self, session_id: str, question: str, use_context: bool,
+                             extra_context: str, intents: dict = None) -> str:
+        """
+        Answer a question within a conversation, reusing the session's KV cache so only
+        the tokens of the new turn are encoded.
+        """
+        with self._session_lock:
+            session = self._get_session(session_id)
+            extra_context = str(extra_context).strip() if extra_context else ""
+
+            limit = SESSION_MAX_TOKENS - MAX_NEW_TOKENS
+            new_ids = None
+            if session["input_ids"] is not None:
+                # Only mention the data again if it changed since the last turn
+                data = f"Here is the latest data:\n{extra_context}\n\n" if extra_context and extra_context != session["extra_context"] else ""
+                new_ids = self._tokenizer(f"{session['pending']}{data}Q: {question}\nA:", return_tensors="pt",
+                                          add_special_tokens=False).input_ids
+                if session["input_ids"].shape[1] + new_ids.shape[1] > limit:
+                    # Token window is full: drop the oldest turns and re-encode the ones that still fit
+                    self._drop_session_cache(session)
+                    new_ids = None
+
+            if new_ids is None:
+                if session["reencode"]:
+                    latest = extra_context or session["extra_context"]
+                    data = f"Here is the latest data:\n{latest}\n\n" if latest else ""
+                    turn_text = self._recent_turns_text(session["turns"], SESSION_MAX_TOKENS // 2) + f"{data}Q: {question}\nA:"
+                else:
+                    turn_text = session["pending"] + self._build_prompt(question, use_context, extra_context, intents)
+                new_ids = self._tokenizer(turn_text, return_tensors="pt").input_ids[:, -limit:]
+
+            input_ids = new_ids if session["input_ids"] is None else torch.cat([session["input_ids"], new_ids.to(session["input_ids"].device)], dim=1)
+            if torch.cuda.is_available():
+                input_ids = input_ids.to("cuda")
+
+            with torch.no_grad():
+                outputs = self._model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=session["past_key_values"],
+                    max_new_tokens=MAX_NEW_TOKENS,
+                    do_sample=False,
+                    num_beams=1,
+                    pad_token_id=self._tokenizer.pad_token_id,
+                    repetition_penalty=1.2,
+                    no_repeat_ngram_size=3,
+                    use_cache=True,
+                    return_dict_in_generate=True
+                )
+
+            response = self._tokenizer.decode(outputs.sequences[0, input_ids.shape[1]:], skip_special_tokens=True)
+            # Stop at a question the model started on its own
+            response = self._post_process_response(response.split("Q:")[0].strip())
+
+            # Keep only the prompt in the cache and encode the answer as shown with the next
+            # turn, so text generated past it never conditions later turns
+            session["input_ids"] = input_ids
+            session["past_key_values"] = self._crop_cache(outputs.past_key_values, input_ids.shape[1])
+            session["pending"] = f" {response}\n"
+            session["reencode"] = False
+            if extra_context:
+                session["extra_context"] = extra_context
+            session["turns"].append(f"Q: {question}\nA: {response}\n")
+            del session["turns"][:-MAX_SESSION_TURNS]
+            self._enforce_cache_budget(session_id)
             return response
-        except Exception as e:
-            print(f"Error in generate_response: {str(e)}")
-            return f"Error generating response: {str(e)}"
+
+    @staticmethod
+    def _crop_cache(past_key_values, length: int):
+        """Cut a KV cache back to its first length positions."""
+        if hasattr(past_key_values, "crop"):
+            past_key_values.crop(length)
+            return past_key_values
+        return tuple((key[:, :, :length], value[:, :, :length]) for key, value in past_key_values)
+
+    @staticmethod
+    def _drop_session_cache(session: dict):
+        """Free a session's KV cache; its next turn re-encodes the recent turns instead."""
+        session["input_ids"] = None
+        session["past_key_values"] = None
+        session["pending"] = ""
+        session["reencode"] = True
+
+    def _cache_token_bytes(self) -> int:
+        """KV cache size of one token: keys and values for every layer."""
+        config = self._model.config
+        kv_heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+        head_dim = config.hidden_size // config.num_attention_heads
+        element = torch.tensor([], dtype=self._model.dtype).element_size()
+        return 2 * config.num_hidden_layers * kv_heads * head_dim * element
+
+    def _enforce_cache_budget(self, keep: str):
+        """Drop the KV caches of the least recently used sessions until all fit in SESSION_CACHE_MB."""
+        budget = SESSION_CACHE_MB * 1024 * 1024 // self._cache_token_bytes()
+        cached = [(sid, session) for sid, session in self._sessions.items() if session["input_ids"] is not None]
+        total = sum(session["input_ids"].shape[1] for _, session in cached)
+        for sid, session in cached:
+            if total <= budget:
+                break
+            if sid != keep:
+                total -= session["input_ids"].shape[1]
+                self._drop_session_cache(session)
+
+    def _recent_turns_text(self, turns: list, max_tokens: int) -> str:
+        """Join the most recent turns that fit within max_tokens."""
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            used += len(self._tokenizer(turn, add_special_tokens=False).input_ids)
+            if used > max_tokens:
+                break
+            kept.append(turn)
+        return "".join(reversed(kept))
+
+    def record_turn(self, session_id: str, question: str, answer: str):
+        """
+        Add a turn answered without the model (e.g., from the answer cache) to a session.
+        It is encoded together with the next question, so nothing runs now.
+        """
+        with self._session_lock:
+            session = self._get_session(session_id)
+            turn = f"Q: {question}\nA: {answer}\n"
+            session["pending"] += turn
+            session["turns"].append(turn)
+            del session["turns"][:-MAX_SESSION_TURNS]
+
+    def end_session(self, session_id: str):
+        """Forget a session and free its KV cache."""
+        with self._session_lock:
+            self._sessions.pop(session_id, None)
 
     def _post_process_response(self, response: str) -> str:
         """Post-process the model's response to improve quality."""
@@ -0,0 +1,300 @@
+"""
+Scheduled Reporting Module
+
+This module runs configured intents on a cadence and writes or emails the results.
+Reports over CustomerTransactions are kept as stored monthly partitions, so each run
+only recomputes the months that can have changed since the previous run and merges
+them with the partitions stored before.
+
+Usage:
+    python report_utils.py reports.json [--once]
+
+Example reports.json:
+    {
+        "server": "MY-SERVER",
+        "database": "FraudDB",
+        "state_dir": "report_state",
+        "intents_file": "intents.json",
+        "timeout": 600,
+        "max_rows": 100000,
+        "smtp": {"sender": "me@example.com", "password_env": "FRAUDGUARD_SMTP_PASSWORD"},
+        "reports": [
+            {"name": "monthly_fraud", "intent": "fraud_analysis", "cadence": "daily",
+             "output_dir": "reports", "email_to": "team@example.com"}
+        ]
+    }
+"""
+
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+from db_utils import run_query
+from email_utils import send_dataframe_email
+from supported_questions import CATEGORY_VOLUME_SQL, FRAUD_PerMonth_SQL, load_intents, same_query
+
+TIME_COLUMN = "Trans_Date_Trans_Time"
+
+WATERMARK_SQL = f"SELECT MAX({TIME_COLUMN}) AS Watermark FROM [dbo].[CustomerTransactions]"
+
+FRAUD_PerMonth_PARTITION_SQL = """
+SELECT
+    FORMAT(Trans_Date_Trans_Time, 'yyyy-MM') AS Month,
+    SUM(CASE WHEN Is_fraud = 1 THEN 1 ELSE 0 END) AS Fraudulent_Transactions,
+    SUM(CASE WHEN Is_fraud = 0 THEN 1 ELSE 0 END) AS Total_Transactions
+FROM [dbo].[CustomerTransactions]
+WHERE Trans_Date_Trans_Time >= ?
+GROUP BY FORMAT(Trans_Date_Trans_Time, 'yyyy-MM')
+"""
+
+CATEGORY_VOLUME_PARTITION_SQL = """
+SELECT
+    FORMAT(Trans_Date_Trans_Time, 'yyyy-MM') AS Month,
+    Category,
+    SUM(Amount) AS Total_Amount,
+    SUM(CASE WHEN Is_Fraud = 1 THEN Amount ELSE 0 END) AS Fraudulent_Amount
+FROM [dbo].[CustomerTransactions]
+WHERE Trans_Date_Trans_Time >= ?
+GROUP BY FORMAT(Trans_Date_Trans_Time, 'yyyy-MM'), Category
+"""
+
+DEFAULT_TIMEOUT = 600
+DEFAULT_MAX_ROWS = 100000
+
+CADENCES = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+
+def combine_fraud_per_month(partitions: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild the FRAUD_PerMonth_SQL result from monthly partitions."""
+    df = partitions.sort_values("Month").reset_index(drop=True)
+    total = pd.DataFrame({
+        "Month": ["Grand Total"],
+        "Fraudulent_Transactions": [df["Fraudulent_Transactions"].sum()],
+        "Total_Transactions": [df["Total_Transactions"].sum()],
+    })
+    df = pd.concat([df, total], ignore_index=True)
+    ratio = df["Fraudulent_Transactions"] / df["Total_Transactions"].where(df["Total_Transactions"] != 0) * 100
+    df["Fraudulent_Ratio"] = ratio.map(lambda x: "0.00%" if pd.isna(x) else f"{x:,.2f}%")
+    return df
+
+
+def combine_category_volume(partitions: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild the CATEGORY_VOLUME_SQL result from monthly partitions."""
+    df = partitions.groupby("Category", as_index=False)[["Total_Amount", "Fraudulent_Amount"]].sum()
+    ratio = df["Fraudulent_Amount"] / df["Total_Amount"].where(df["Total_Amount"] != 0) * 100
+    df = df.assign(_ratio=ratio).sort_values("_ratio", ascending=False, na_position="last")
+    return pd.DataFrame({
+        "Category": df["Category"],
+        "Total_Amount": df["Total_Amount"].map(lambda x: f"{x:,.0f}"),
+        "Fraudulent_Amount": df["Fraudulent_Amount"].map(lambda x: f"{x:,.0f}"),
+        "Fraud_Ratio": df["_ratio"].map(lambda x: None if pd.isna(x) else f"{round(x, 2):,.0f}%"),
+    }).reset_index(drop=True)
+
+
+# Intents whose results can be rebuilt from monthly partitions, and the built-in
+# query each partition query rebuilds
+PARTITIONED_INTENTS = {
+    "fraud_analysis": {"query": FRAUD_PerMonth_PARTITION_SQL, "combine": combine_fraud_per_month,
+                       "exact": FRAUD_PerMonth_SQL},
+    "category_volume": {"query": CATEGORY_VOLUME_PARTITION_SQL, "combine": combine_category_volume,
+                        "exact": CATEGORY_VOLUME_SQL},
+}
+
+
+def _month_start(timestamp) -> datetime:
+    return pd.Timestamp(timestamp).to_pydatetime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_run(last_run: datetime, cadence) -> datetime:
+    if isinstance(cadence, (int, float)):
+        return last_run + timedelta(seconds=cadence)
+    if cadence == "monthly":
+        return (_month_start(last_run) + timedelta(days=32)).replace(day=1)
+    return last_run + CADENCES[cadence]
+
+
+class ReportScheduler:
+    """
+    Runs configured reports on their cadence, incrementally where the intent allows it.
+
+    Per report, the state directory holds the stored partitions (<name>.partitions.pkl)
+    and a JSON file with the last run time and the data watermark seen by that run.
+    """
+
+    def __init__(self, config: dict):
+        """
+        Initialize the scheduler.
+
+        Args:
+            config (dict): Parsed report configuration, see the module docstring.
+        """
+        self.server = config["server"]
+        self.database = config["database"]
+        self.state_dir = config.get("state_dir", "report_state")
+        self.smtp = config.get("smtp", {})
+        self.reports = config.get("reports", [])
+        self.timeout = config.get("timeout", DEFAULT_TIMEOUT)
+        self.max_rows = config.get("max_rows", DEFAULT_MAX_ROWS)
+        self.intents = load_intents(config.get("intents_file"))
+        for report in self.reports:
+            if report["intent"] not in self.intents:
+                raise ValueError(f"Unknown intent in report '{report['name']}': {report['intent']}")
+            if self.intents[report["intent"]].get("unbounded"):
+                raise ValueError(f"Intent '{report['intent']}' in report '{report['name']}' returns the whole "
+                                 "table and cannot be scheduled")
+            cadence = report.get("cadence", "daily")
+            if not isinstance(cadence, (int, float)) and cadence != "monthly" and cadence not in CADENCES:
+                raise ValueError(f"Unknown cadence in report '{report['name']}': {cadence}")
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ReportScheduler":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _state_path(self, name: str) -> str:
+        return os.path.join(self.state_dir, f"{name}.state.json")
+
+    def _partitions_path(self, name: str) -> str:
+        return os.path.join(self.state_dir, f"{name}.partitions.pkl")
+
+    def _load_state(self, name: str) -> dict:
+        path = self._state_path(name)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self, name: str, state: dict):
+        path = self._state_path(name)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def is_due(self, report: dict, now: datetime = None) -> bool:
+        last_run = self._load_state(report["name"]).get("last_run")
+        if last_run is None:
+            return True
+        now = now or datetime.now()
+        return now >= _next_run(datetime.fromisoformat(last_run), report.get("cadence", "daily"))
+
+    def build_report(self, report: dict, state: dict) -> pd.DataFrame:
+        """
+        Compute the result of a report, recomputing only the changed partitions if possible.
+
+        Args:
+            report (dict): The report configuration.
+            state (dict): The stored state of the report; updated in place.
+
+        Returns:
+            DataFrame or None: The report result, or None if a query failed.
+        """
+        intent = report["intent"]
+        partitioned = PARTITIONED_INTENTS.get(intent)
+        # An intent edited in the catalog file may ask something the partitions do not answer
+        if partitioned is not None and not same_query(self.intents[intent]["query"], partitioned["exact"]):
+            partitioned = None
+        if partitioned is None:
+            result_df = run_query(self.server, self.database, self.intents[intent]["query"],
+                                  timeout=self.timeout, max_rows=self.max_rows)
+            if result_df is not None and result_df.attrs.get("truncated"):
+                print(f"Report '{report['name']}' was cut off at {self.max_rows} rows.")
+            return result_df
+
+        watermark_df = run_query(self.server, self.database, WATERMARK_SQL, timeout=self.timeout)
+        if watermark_df is None:
+            return None
+        watermark = watermark_df["Watermark"].iloc[0]
+
+        stored = None
+        partitions_path = self._partitions_path(report["name"])
+        if state.get("watermark") and os.path.exists(partitions_path):
+            stored = pd.read_pickle(partitions_path)
+            # Rows arrive in or after the month of the last watermark, so older months are final
+            since = _month_start(state["watermark"])
+        else:
+            since = datetime(1900, 1, 1)
+
+        fresh = run_query(self.server, self.database, partitioned["query"], params=[since], timeout=self.timeout)
+        if fresh is None:
+            return None
+        if stored is not None:
+            stored = stored[stored["Month"] < since.strftime("%Y-%m")]
+            fresh = pd.concat([stored, fresh], ignore_index=True)
+
+        fresh.to_pickle(partitions_path)
+        if not pd.isna(watermark):
+            state["watermark"] = pd.Timestamp(watermark).isoformat()
+        return partitioned["combine"](fresh)
+
+    def run_report(self, report: dict, now: datetime = None):
+        """Run one report and deliver its output."""
+        now = now or datetime.now()
+        state = self._load_state(report["name"])
+        result_df = self.build_report(report, state)
+        if result_df is None:
+            print(f"Report '{report['name']}' failed; it will be retried on the next check.")
+            return
+
+        if report.get("output_dir"):
+            os.makedirs(report["output_dir"], exist_ok=True)
+            file_path = os.path.join(report["output_dir"], f"{report['name']}_{now:%Y%m%d_%H%M}.xlsx")
+            result_df.to_excel(file_path, index=False)
+            print(f"Report '{report['name']}' written to {file_path}")
+
+        if report.get("email_to"):
+            sender = self.smtp.get("sender")
+            password = os.environ.get(self.smtp.get("password_env", "FRAUDGUARD_SMTP_PASSWORD"))
+            if not sender or not password:
+                print(f"Report '{report['name']}' not emailed: SMTP sender or password is missing.")
+            else:
+                title = report["intent"].replace('_', ' ').title()
+                send_dataframe_email(
+                    result_df, sender, password, report["email_to"],
+                    subject=f"FraudGuard Report: {title} ({now:%Y-%m-%d})",
+                    body=f"Please find the scheduled {title} report attached.",
+                    file_name=f"{report['name']}.xlsx"
+                )
+                print(f"Report '{report['name']}' sent to {report['email_to']}")
+
+        state["last_run"] = now.isoformat()
+        self._save_state(report["name"], state)
+
+    def run_due(self, now: datetime = None):
+        """Run every report that is due."""
+        for report in self.reports:
+            if self.is_due(report, now):
+                try:
+                    self.run_report(report, now)
+                except Exception as e:
+                    print(f"Error running report '{report['name']}': {e}")
+
+    def run_forever(self, stop_event: threading.Event = None, interval: float = 60.0):
+        """
+        Check for due reports every interval seconds until stop_event is set.
+
+        Args:
+            stop_event (threading.Event): Set to stop the scheduler.
+            interval (float): Seconds between checks.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.run_due()
+            stop_event.wait(interval)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python report_utils.py reports.json [--once]")
+        sys.exit(1)
+    scheduler = ReportScheduler.from_file(sys.argv[1])
+    if "--once" in sys.argv[2:]:
+        scheduler.run_due()
+    else:
+        scheduler.run_forever()
@@ -0,0 +1,306 @@
+"""
+Real-Time Fraud Scoring Module
+
+This module polls CustomerTransactions for rows at or past a watermark and scores
+only the rows it has not seen, using rolling per-category and per-card amount
+statistics that are updated incrementally with exponential decay instead of
+recomputed from history.
+"""
+
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from db_utils import establish_connection
+
+TABLE_NAME = "[dbo].[CustomerTransactions]"
+TIME_COLUMN = "Trans_Date_Trans_Time"
+AMOUNT_COLUMN = "Amount"
+CATEGORY_COLUMN = "Category"
+CARD_COLUMN = "Cc_Num"
+KEY_COLUMN = "Trans_Num"  # Unique per transaction
+
+WATERMARK_SQL = f"SELECT MAX({TIME_COLUMN}) AS Watermark FROM {TABLE_NAME}"
+
+# Seeds the rolling state with one server-side aggregate over recent history
+GROUP_STATS_SQL = """
+SELECT
+    {key} AS Group_Key,
+    COUNT({amount}) AS n,
+    AVG(CAST({amount} AS FLOAT)) AS mean,
+    COALESCE(VARP(CAST({amount} AS FLOAT)), 0) * COUNT({amount}) AS m2
+FROM {table}
+WHERE {time} > ? AND {time} <= ?
+GROUP BY {key}
+"""
+
+WATERMARK_KEYS_SQL = """
+SELECT {key_column} FROM {table} WHERE {time} = ?
+"""
+
+# Rows at the watermark time are read again, so rows committed late with that same
+# timestamp are not missed; the ones already scored are skipped by key
+NEW_ROWS_SQL = """
+SELECT TOP ({limit}) {columns}
+FROM {table}
+WHERE {time} >= ?
+ORDER BY {time}, {key_column}
+"""
+
+
+def _empty_stats() -> pd.DataFrame:
+    return pd.DataFrame({"n": [], "mean": [], "m2": []}, dtype=float)
+
+
+def _batch_stats(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """Count, mean and sum of squared deviations of the amount per group in a batch."""
+    grouped = df.groupby(key)[AMOUNT_COLUMN]
+    n = grouped.count().astype(float)
+    mean = grouped.mean()
+    m2 = grouped.var(ddof=0).fillna(0.0) * n
+    return pd.DataFrame({"n": n, "mean": mean, "m2": m2})
+
+
+def _decay_stats(state: pd.DataFrame, factor: float, min_weight: float = 0.01) -> pd.DataFrame:
+    """Down-weight the state by factor; mean and variance are unchanged, only their weight shrinks."""
+    if factor >= 1.0:
+        return state
+    decayed = state.assign(n=state["n"] * factor, m2=state["m2"] * factor)
+    # Groups not seen for many half-lives no longer carry any weight
+    return decayed[decayed["n"] >= min_weight]
+
+
+def _merge_stats(state: pd.DataFrame, batch: pd.DataFrame) -> pd.DataFrame:
+    """Merge batch statistics into the running state (Chan et al. parallel variance)."""
+    index = state.index.union(batch.index)
+    a = state.reindex(index, fill_value=0.0)
+    b = batch.reindex(index, fill_value=0.0)
+    n = a["n"] + b["n"]
+    safe_n = n.where(n > 0, 1.0)
+    delta = b["mean"] - a["mean"]
+    mean = a["mean"] + delta * b["n"] / safe_n
+    m2 = a["m2"] + b["m2"] + delta ** 2 * a["n"] * b["n"] / safe_n
+    return pd.DataFrame({"n": n, "mean": mean, "m2": m2})
+
+
+class FraudStreamScorer:
+    """
+    Incremental fraud scorer over new CustomerTransactions rows.
+
+    Each poll reads at most batch_size unseen rows from the watermark on, scores them
+    against the rolling statistics, then folds them into the statistics. The
+    statistics decay with a half-life in transaction time, so they follow recent
+    spending rather than all of history.
+    """
+
+    def __init__(self, server: str, database: str, batch_size: int = 5000,
+                 z_threshold: float = 3.0, card_ratio_threshold: float = 5.0,
+                 min_history: int = 5, alert_threshold: float = 0.5,
+                 half_life_days: float = 30.0, history_days: float = 90.0):
+        """
+        Initialize the streaming scorer.
+
+        Args:
+            server (str): SQL Server name.
+            database (str): Database name.
+            batch_size (int): Maximum number of rows read per poll.
+            z_threshold (float): Amount z-score within its category that counts as unusual.
+            card_ratio_threshold (float): Amount / card average ratio that counts as unusual.
+            min_history (int): Minimum rows a category or card needs before its rule applies.
+            alert_threshold (float): Score at or above which a row raises an alert.
+            half_life_days (float): Transaction-time half-life of the rolling statistics.
+            history_days (float): Days of history the statistics are seeded from.
+        """
+        self.server = server
+        self.database = database
+        self.batch_size = batch_size
+        self.z_threshold = z_threshold
+        self.card_ratio_threshold = card_ratio_threshold
+        self.min_history = min_history
+        self.alert_threshold = alert_threshold
+        self.half_life = pd.Timedelta(days=half_life_days)
+        self.history = pd.Timedelta(days=history_days)
+
+        self.watermark = None
+        self.watermark_keys = set()  # Keys of the rows already scored at the watermark time
+        self.category_stats = _empty_stats()
+        self.card_stats = _empty_stats()
+        self.stats = {
+            "rows_scored": 0,
+            "alerts": 0,
+            "rows_per_second": 0.0,
+            "processing_lag_seconds": None,  # Newest row in the table minus the watermark
+            "data_age_seconds": None,  # Now minus the newest row in the table
+            "backlog": False,
+            "watermark": None,
+        }
+        self._conn = None
+
+    def _read_sql(self, query: str, params=None) -> pd.DataFrame:
+        if self._conn is None:
+            self._conn = establish_connection(self.server, self.database)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                return pd.read_sql(query, self._conn, params=params)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Close the polling connection."""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def initialize(self):
+        """Set the watermark to the newest row and seed the rolling statistics from recent history."""
+        watermark = self._read_sql(WATERMARK_SQL)["Watermark"].iloc[0]
+        self.watermark = None if pd.isna(watermark) else pd.Timestamp(watermark)
+        if self.watermark is None:
+            return
+        until = self.watermark.to_pydatetime()
+        since = (self.watermark - self.history).to_pydatetime()
+        for key, attr in ((CATEGORY_COLUMN, "category_stats"), (CARD_COLUMN, "card_stats")):
+            query = GROUP_STATS_SQL.format(key=key, amount=AMOUNT_COLUMN, table=TABLE_NAME, time=TIME_COLUMN)
+            seed = self._read_sql(query, params=[since, until])
+            setattr(self, attr, seed.set_index("Group_Key")[["n", "mean", "m2"]].astype(float))
+        query = WATERMARK_KEYS_SQL.format(key_column=KEY_COLUMN, table=TABLE_NAME, time=TIME_COLUMN)
+        self.watermark_keys = set(self._read_sql(query, params=[until])[KEY_COLUMN])
+        self.stats["watermark"] = self.watermark
+        self._update_lag(self.watermark)
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Score a batch of transactions against the current statistics.
+
+        Args:
+            df (DataFrame): New transactions.
+
+        Returns:
+            DataFrame: The batch with Fraud_Score and Reasons columns added.
+        """
+        amount = df[AMOUNT_COLUMN].astype(float)
+
+        cat = self.category_stats.reindex(df[CATEGORY_COLUMN].to_numpy())
+        cat_n = cat["n"].fillna(0.0).to_numpy()
+        cat_std = np.sqrt(cat["m2"].to_numpy() / np.where(cat_n > 0, cat_n, 1.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (amount.to_numpy() - cat["mean"].to_numpy()) / cat_std
+        unusual_for_category = (cat_n >= self.min_history) & (np.nan_to_num(z, nan=0.0, posinf=0.0) >= self.z_threshold)
+
+        card = self.card_stats.reindex(df[CARD_COLUMN].to_numpy())
+        card_n = card["n"].fillna(0.0).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = amount.to_numpy() / card["mean"].to_numpy()
+        unusual_for_card = (card_n >= self.min_history) & (np.nan_to_num(ratio, nan=0.0, posinf=0.0) >= self.card_ratio_threshold)
+
+        hour = pd.to_datetime(df[TIME_COLUMN]).dt.hour.to_numpy()
+        night = (hour >= 22) | (hour < 4)
+
+        score = 0.5 * unusual_for_category + 0.3 * unusual_for_card + 0.2 * night
+        reasons = np.full(len(df), "", dtype=object)
+        reasons = np.where(unusual_for_category, reasons + "amount unusual for category; ", reasons)
+        reasons = np.where(unusual_for_card, reasons + "amount unusual for card; ", reasons)
+        reasons = np.where(night, reasons + "night-time transaction; ", reasons)
+
+        scored = df.copy()
+        scored["Fraud_Score"] = score
+        scored["Reasons"] = pd.Series(reasons, index=df.index).str.rstrip("; ")
+        return scored
+
+    def poll(self) -> pd.DataFrame:
+        """
+        Read, score and absorb the unseen rows from the watermark on.
+
+        Returns:
+            DataFrame: The rows that raised an alert (may be empty).
+        """
+        if self.watermark is None:
+            self.initialize()
+            if self.watermark is None:
+                return pd.DataFrame()
+
+        started = time.perf_counter()
+        columns = ", ".join([TIME_COLUMN, KEY_COLUMN, CARD_COLUMN, CATEGORY_COLUMN, AMOUNT_COLUMN])
+        # Read enough rows that batch_size unseen ones fit even if every seen row comes back
+        limit = int(self.batch_size) + len(self.watermark_keys)
+        query = NEW_ROWS_SQL.format(limit=limit, columns=columns, table=TABLE_NAME, time=TIME_COLUMN,
+                                    key_column=KEY_COLUMN)
+        df = self._read_sql(query, params=[self.watermark.to_pydatetime()])
+        self.stats["backlog"] = len(df) >= limit
+
+        times = pd.to_datetime(df[TIME_COLUMN])
+        seen = (times == self.watermark) & df[KEY_COLUMN].isin(self.watermark_keys)
+        df = df[~seen].head(self.batch_size)
+
+        if df.empty:
+            self.stats["rows_per_second"] = 0.0
+            self._update_lag()
+            return df
+
+        scored = self.score(df)
+        newest = pd.Timestamp(df[TIME_COLUMN].iloc[-1])
+        # Age the statistics by the transaction time that passed, then add the batch
+        factor = 0.5 ** ((newest - self.watermark) / self.half_life)
+        self.category_stats = _merge_stats(_decay_stats(self.category_stats, factor), _batch_stats(df, CATEGORY_COLUMN))
+        self.card_stats = _merge_stats(_decay_stats(self.card_stats, factor), _batch_stats(df, CARD_COLUMN))
+
+        at_newest = set(df.loc[pd.to_datetime(df[TIME_COLUMN]) == newest, KEY_COLUMN])
+        self.watermark_keys = self.watermark_keys | at_newest if newest == self.watermark else at_newest
+        self.watermark = newest
+
+        alerts = scored[scored["Fraud_Score"] >= self.alert_threshold]
+        elapsed = time.perf_counter() - started
+        self.stats["rows_scored"] += len(df)
+        self.stats["alerts"] += len(alerts)
+        self.stats["rows_per_second"] = len(df) / elapsed if elapsed > 0 else float(len(df))
+        self.stats["watermark"] = self.watermark
+        self._update_lag()
+        return alerts
+
+    def _update_lag(self, newest=None):
+        """
+        Report processing lag and data age separately: the lag is zero once every row is
+        scored, however long ago the newest transaction happened.
+        """
+        if self.watermark is None:
+            return
+        if newest is None:
+            if self.stats["backlog"]:
+                newest = self._read_sql(WATERMARK_SQL)["Watermark"].iloc[0]
+                newest = self.watermark if pd.isna(newest) else pd.Timestamp(newest)
+            else:
+                newest = self.watermark
+        self.stats["processing_lag_seconds"] = max(0.0, (newest - self.watermark).total_seconds())
+        self.stats["data_age_seconds"] = max(0.0, (pd.Timestamp.now() - newest).total_seconds())
+
+    def run(self, stop_event, on_alerts=None, on_stats=None, interval: float = 5.0):
+        """
+        Poll until stop_event is set, catching up without waiting while there is a backlog.
+
+        Args:
+            stop_event (threading.Event): Set to stop polling.
+            on_alerts (callable): Called with each non-empty alerts DataFrame.
+            on_stats (callable): Called with a copy of self.stats after every poll.
+            interval (float): Seconds to wait between polls once caught up.
+        """
+        try:
+            while not stop_event.is_set():
+                try:
+                    alerts = self.poll()
+                except Exception as e:
+                    print(f"Error polling new transactions: {e}")
+                    stop_event.wait(interval)
+                    continue
+                if on_alerts is not None and not alerts.empty:
+                    on_alerts(alerts)
+                if on_stats is not None:
+                    on_stats(dict(self.stats))
+                if not self.stats["backlog"]:
+                    stop_event.wait(interval)
+        finally:
+            self.close()
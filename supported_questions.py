@@ -1,3 +1,6 @@
+import json
+import os
+
 FRAUD_PerMonth_SQL = """
 SELECT
     COALESCE(FORMAT(Trans_Date_Trans_Time, 'yyyy-MM'), 'Grand Total') AS Month,
@@ -52,7 +55,11 @@ INTENTS = {
             "List every transaction record.",
             "Get all transaction data."
         ],
-        "query": GENERIC_ALL_DATA_SQL
+        "query": GENERIC_ALL_DATA_SQL,
+        # Returns the whole table, so it is paged and never run ahead of time.
+        # Trans_Num is unique, so rows sharing a timestamp keep a fixed page order
+        "unbounded": True,
+        "order_by": "Trans_Date_Trans_Time, Trans_Num"
     },
     "category_volume": {
         "examples": [
@@ -64,3 +71,85 @@ INTENTS = {
         "query": CATEGORY_VOLUME_SQL
     },
 }
+
+
+def load_intents(path: str = None) -> dict:
+    """
+    Load an intent catalog from a JSON file with the same layout as INTENTS.
+
+    Args:
+        path (str): Path of the catalog file. The built-in INTENTS are returned if it
+            is not given or does not exist.
+
+    Returns:
+        dict: Mapping of intent name to its examples, query and optional flags.
+
+    Raises:
+        ValueError: If the file is not a valid intent catalog.
+    """
+    if not path or not os.path.exists(path):
+        return INTENTS
+    with open(path, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    if not isinstance(catalog, dict) or not catalog:
+        raise ValueError(f"Intent catalog {path} must be a non-empty JSON object.")
+    for intent, data in catalog.items():
+        examples = data.get("examples") if isinstance(data, dict) else None
+        if not isinstance(examples, list) or not examples or not all(isinstance(e, str) for e in examples):
+            raise ValueError(f"Intent '{intent}' must have a non-empty list of example strings.")
+        if not isinstance(data.get("query"), str) or not data["query"].strip():
+            raise ValueError(f"Intent '{intent}' must have a SQL query.")
+    return catalog
+
+
+def paged_query(query: str, offset: int, page_size: int, order_by: str = None) -> str:
+    """
+    Wrap a query without its own ORDER BY in OFFSET/FETCH paging.
+
+    Args:
+        query (str): The SQL query to page.
+        offset (int): Number of rows to skip.
+        page_size (int): Number of rows to return.
+        order_by (str): Column(s) giving a stable page order; they must identify each row
+            uniquely, or OFFSET pages can repeat or skip rows. Arbitrary order if not given.
+
+    Returns:
+        str: The paged SQL query.
+    """
+    return (
+        f"{query.strip().rstrip(';')}\n"
+        f"ORDER BY {order_by or '(SELECT NULL)'}\n"
+        f"OFFSET {int(offset)} ROWS FETCH NEXT {int(page_size)} ROWS ONLY"
+    )
+
+
+def same_query(query: str, other: str) -> bool:
+    """Check whether two SQL queries are the same text, ignoring whitespace and a trailing semicolon."""
+    return " ".join(query.strip().rstrip(";").split()) == " ".join(other.strip().rstrip(";").split())
+
+
+def dashboard_intents(intents: dict = None):
+    """
+    Return the intents that are safe to run ahead of time for the dashboard:
+    parameterless queries that do not scan the whole table into the client.
+
+    Args:
+        intents (dict): The intent catalog to use; defaults to INTENTS.
+
+    Returns:
+        dict: Mapping of intent name to SQL query.
+    """
+    return {
+        intent: data["query"]
+        for intent, data in (intents or INTENTS).items()
+        if not data.get("unbounded") and not data.get("params")
+    }
+
+
+if __name__ == "__main__":
+    # Write the built-in intents as a starting catalog file
+    import sys
+    out_path = sys.argv[1] if len(sys.argv) > 1 else "intents.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(INTENTS, f, indent=4)
+    print(f"Intent catalog written to {out_path}")
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from cache_utils import AnswerCache, answer_context_hash
+
+# Averaged word vectors barely move when one entity is swapped, so every question
+# below gets the same vector and only the key terms can tell them apart
+VECTOR = np.ones(8, dtype=np.float32)
+CTX = answer_context_hash(False)
+
+
+@pytest.fixture
+def cache():
+    cache = AnswerCache()
+    cache.put("How can I detect credit card fraud in March?", VECTOR, CTX, "march answer")
+    cache.put("Which category had the most fraud in grocery_pos?", VECTOR, CTX, "grocery answer")
+    cache.put("Are transactions over 1,000 risky?", VECTOR, CTX, "amount answer")
+    return cache
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("how do I detect credit card fraud in march", "march answer"),
+    ("Please show how to detect credit card fraud in March.", "march answer"),
+    ("Which categories had the most fraud in grocery_pos?", "grocery answer"),
+    ("Is a transaction over 1000 risky?", "amount answer"),
+])
+def test_paraphrases_hit(cache, question, answer):
+    assert cache.get(question, VECTOR, CTX) == answer
+
+
+@pytest.mark.parametrize("question", [
+    "How can I detect credit card fraud in April?",
+    "Which category had the most fraud in travel?",
+    "Are transactions over 5,000 risky?",
+    "Are transactions under 1,000 risky?",
+])
+def test_entity_swaps_miss(cache, question):
+    assert cache.get(question, VECTOR, CTX) is None
+
+
+def test_other_context_misses(cache):
+    other = answer_context_hash(True, "data summary")
+    assert cache.get("How can I detect credit card fraud in March?", VECTOR, other) is None